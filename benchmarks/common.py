@@ -0,0 +1,96 @@
+import os,sys,time,platform,tracemalloc,statistics
+
+# ////////////////////////////////////////////////////////////
+def GetVersions():
+	import numpy as np
+	ret={"python":platform.python_version(), "platform":platform.platform(), "numpy":np.__version__}
+	for name in ["openvisuspy","OpenVisusNoGui","OpenVisus","panel","bokeh"]:
+		try:
+			from importlib.metadata import version
+			ret[name]=version(name)
+		except Exception:
+			pass
+	return ret
+
+# ////////////////////////////////////////////////////////////
+def Summarize(values):
+	values=[it for it in values if it is not None]
+	if not values:
+		return None
+	return {
+		"min": min(values),
+		"median": statistics.median(values),
+		"max": max(values),
+	}
+
+# ////////////////////////////////////////////////////////////
+def Percentiles(values, percentiles=(50,95,99)):
+	values=sorted(it for it in values if it is not None)
+	if not values:
+		return None
+	return {f"p{P}": values[min(len(values)-1,int(round(P/100.0*(len(values)-1))))] for P in percentiles}
+
+# ////////////////////////////////////////////////////////////
+def GetRSS():
+	"""
+	current resident memory of the process in bytes
+	"""
+	try:
+		with open("/proc/self/status") as f:
+			for line in f:
+				if line.startswith("VmRSS:"):
+					return int(line.split()[1])*1024
+	except Exception:
+		pass
+	import resource
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*(1 if sys.platform=="darwin" else 1024)
+
+# ////////////////////////////////////////////////////////////
+def GetCPUTime():
+	import resource
+	usage=resource.getrusage(resource.RUSAGE_SELF)
+	return usage.ru_utime+usage.ru_stime
+
+# ////////////////////////////////////////////////////////////
+def MeasurePeakMemory(fn):
+	"""
+	Peak of python/numpy allocations while running `fn` (run it outside the timed loops, tracemalloc slows down allocations)
+	"""
+	tracemalloc.start()
+	try:
+		fn()
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+# ////////////////////////////////////////////////////////////
+def CreateHeadlessSlice(url, width=1024, height=768):
+	"""
+	Slice without a browser: the canvas has a fixed size and the caller drives `onIdle` (see RunSliceUntilFinished)
+	"""
+	from openvisuspy import Slice
+	slice=Slice()
+	slice.canvas.setFixedSize(width, height)
+	slice.events=[]
+	got_new_data=slice.gotNewData
+	def GotNewData(result):
+		got_new_data(result)
+		slice.events.append({"t":time.perf_counter(), "H":result["H"], "running":result["running"], "nbytes":int(result["data"].nbytes)})
+	slice.gotNewData=GotNewData
+	slice.load(url)
+	return slice
+
+# ////////////////////////////////////////////////////////////
+def RunSliceUntilFinished(slice, timeout=120.0, sleep=0.001):
+	"""
+	Drive `slice.onIdle` until the last refinement of the current job has been rendered.
+	Returns (time to first refinement, time to final refinement) in seconds, or None for a timeout
+	"""
+	slice.events=[]
+	T1=time.perf_counter()
+	while (time.perf_counter()-T1)<timeout:
+		slice.onIdle()
+		if slice.events and not slice.events[-1]["running"] and not slice.new_job:
+			return slice.events[0]["t"]-T1, slice.events[-1]["t"]-T1
+		time.sleep(sleep)
+	return None
@@ -0,0 +1,41 @@
+import os,sys,json,argparse
+
+# ////////////////////////////////////////////////////////////
+def Flatten(value, prefix=""):
+	ret={}
+	if isinstance(value,dict):
+		for k,v in value.items():
+			ret.update(Flatten(v, f"{prefix}/{k}" if prefix else k))
+	elif isinstance(value,(int,float)) and not isinstance(value,bool):
+		ret[prefix]=value
+	return ret
+
+# ////////////////////////////////////////////////////////////
+if __name__=="__main__":
+
+	parser = argparse.ArgumentParser(description="Compare two JSON reports of run_benchmarks.py (i.e. two openvisuspy versions or configurations)")
+	parser.add_argument("old")
+	parser.add_argument("new")
+	parser.add_argument("--filter", default="", help="only keys containing this string (e.g. `median`)")
+	parser.add_argument("--threshold", type=float, default=0.0, help="only show changes bigger than this ratio (e.g. 0.1 for 10%%)")
+	args = parser.parse_args()
+
+	with open(args.old) as f: old=json.load(f)
+	with open(args.new) as f: new=json.load(f)
+
+	print(f"old: {args.old} {old.get('versions',{}).get('openvisuspy','')}")
+	print(f"new: {args.new} {new.get('versions',{}).get('openvisuspy','')}")
+
+	A=Flatten({"convert_data_for_rendering":old.get("convert_data_for_rendering",{}), "datasets":old.get("datasets",{})})
+	B=Flatten({"convert_data_for_rendering":new.get("convert_data_for_rendering",{}), "datasets":new.get("datasets",{})})
+
+	for key in sorted(set(A) & set(B)):
+		if args.filter and args.filter not in key: continue
+		if "/spec/" in key or key.endswith("/shape"): continue
+		a,b=A[key],B[key]
+		ratio=(b/a) if a else None
+		if ratio is not None and abs(ratio-1.0)<args.threshold: continue
+		print(f"{key:100} {a:14.6g} {b:14.6g} {'' if ratio is None else f'{ratio:8.3f}x'}")
+
+	for key in sorted(set(A) ^ set(B)):
+		print(f"{key:100} only in {'old' if key in A else 'new'}")
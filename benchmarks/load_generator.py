@@ -0,0 +1,175 @@
+import os,sys,time,json,argparse,logging,threading,multiprocessing
+
+logger = logging.getLogger("load_generator")
+
+PATTERNS=["pan","zoom","offset","play","mixed"]
+
+# ////////////////////////////////////////////////////////////
+def ApplyInteraction(slice, kind, I):
+	"""
+	what a user does with the mouse/widgets, it ends up in `slice.refresh()`
+	"""
+	if kind=="mixed":
+		kind=["pan","zoom","offset","play"][I % 4]
+
+	# offset does not make sense in 1D/2D
+	if kind=="offset" and slice.getPointDim()<3:
+		kind="pan"
+
+	if kind=="pan":
+		x,y,w,h=slice.canvas.getViewport()
+		dx=0.1*w*(1 if (I//2)%2==0 else -1)
+		slice.canvas.setViewport([x+dx,y,w,h])
+		slice.canvas.onIdle()
+
+	elif kind=="zoom":
+		x,y,w,h=slice.canvas.getViewport()
+		scale=0.8 if (I//2)%2==0 else 1.25
+		cx,cy=x+0.5*w,y+0.5*h
+		w,h=w*scale,h*scale
+		slice.canvas.setViewport([cx-0.5*w,cy-0.5*h,w,h])
+		slice.canvas.onIdle()
+
+	elif kind=="offset":
+		A,B=slice.offset.start,slice.offset.end
+		step=max((B-A)/20.0,1.0)
+		value=slice.offset.value+step
+		slice.offset.value=A if value>B else value
+
+	elif kind=="play":
+		T=int(slice.timestep.value)+int(slice.timestep_delta.value)
+		slice.timestep.value=slice.timestep.start if T>slice.timestep.end else T
+
+	else:
+		raise Exception(f"unknown interaction {kind}")
+
+# ////////////////////////////////////////////////////////////
+def RunSessions(url, num_sessions, pattern, num_steps, think_time, width, height, timeout):
+	"""
+	N headless sessions in this process, all driven by a single thread (i.e. as the bokeh server event loop would do)
+	"""
+	from common import CreateHeadlessSlice, GetRSS, GetCPUTime
+
+	rss0=GetRSS()
+	threads0=threading.active_count()
+	sessions=[CreateHeadlessSlice(url, width=width, height=height) for I in range(num_sessions)]
+	rss1=GetRSS()
+
+	latencies={"first":[], "final":[]}
+	num_timeouts=0
+	cpu0,T0=GetCPUTime(),time.perf_counter()
+
+	for step in range(num_steps+1):
+
+		# step 0 is the initial open
+		t1={}
+		for S,slice in enumerate(sessions):
+			if step>0: ApplyInteraction(slice, pattern, step-1)
+			slice.events=[]
+			t1[S]=time.perf_counter()
+
+		pending=set(range(num_sessions))
+		while pending and (time.perf_counter()-min(t1.values()))<timeout:
+			for S in list(pending):
+				slice=sessions[S]
+				slice.onIdle()
+				if slice.events and not slice.events[-1]["running"] and not slice.new_job:
+					latencies["first"].append(slice.events[0]["t"]-t1[S])
+					latencies["final"].append(slice.events[-1]["t"]-t1[S])
+					pending.remove(S)
+			time.sleep(0.001)
+		num_timeouts+=len(pending)
+
+		if think_time: time.sleep(think_time)
+
+	sec=time.perf_counter()-T0
+	cpu=GetCPUTime()-cpu0
+	ret={
+		"num_sessions": num_sessions,
+		"latencies": latencies,
+		"num_timeouts": num_timeouts,
+		"sec": sec,
+		"cpu_sec": cpu,
+		"cpu_percent": 100.0*cpu/sec if sec>0 else 0.0,
+		"rss_bytes": GetRSS(),
+		"rss_per_session_bytes": (rss1-rss0)/max(num_sessions,1),
+		"num_threads": threading.active_count(),
+		"num_threads_per_session": (threading.active_count()-threads0)/max(num_sessions,1),
+	}
+	for slice in sessions:
+		slice.stop()
+	return ret
+
+# ////////////////////////////////////////////////////////////
+def RunSessionsInProcess(kwargs):
+	logging.basicConfig(level=logging.WARNING)
+	return RunSessions(**kwargs)
+
+# ////////////////////////////////////////////////////////////
+if __name__=="__main__":
+
+	parser = argparse.ArgumentParser(description="Load generator: N concurrent headless Slice sessions replaying scripted interactions")
+	parser.add_argument("--url", default="", help="dataset url (default: a synthetic dataset, see --dataset)")
+	parser.add_argument("--dataset", default="3d-float32-256x256x64-t4", help="synthetic dataset name (see synthetic.py)")
+	parser.add_argument("--datasets-dir", default=os.path.expanduser("~/visus/benchmark-datasets"))
+	parser.add_argument("--num-sessions", type=int, default=10)
+	parser.add_argument("--num-processes", type=int, default=1)
+	parser.add_argument("--pattern", default="mixed", choices=PATTERNS)
+	parser.add_argument("--num-steps", type=int, default=20, help="number of interactions per session")
+	parser.add_argument("--think-time", type=float, default=0.0, help="seconds between interactions")
+	parser.add_argument("--width", type=int, default=1024)
+	parser.add_argument("--height", type=int, default=768)
+	parser.add_argument("--timeout", type=float, default=120.0, help="max seconds to wait for the final refinement of an interaction")
+	parser.add_argument("--output", default="", help="JSON output filename (default stdout)")
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+
+	from common import Percentiles, GetVersions
+
+	url=args.url
+	if not url:
+		from synthetic import DATASETS, CreateSyntheticDatasets
+		scale=[scale for scale,specs in DATASETS.items() if any(it["name"]==args.dataset for it in specs)][0]
+		url=[url for spec,url in CreateSyntheticDatasets(args.datasets_dir, scale) if spec["name"]==args.dataset][0]
+
+	# split the sessions among processes
+	num_processes=max(1,min(args.num_processes,args.num_sessions))
+	jobs=[dict(
+		url=url,
+		num_sessions=args.num_sessions//num_processes + (1 if P<args.num_sessions%num_processes else 0),
+		pattern=args.pattern,
+		num_steps=args.num_steps,
+		think_time=args.think_time,
+		width=args.width,
+		height=args.height,
+		timeout=args.timeout) for P in range(num_processes)]
+
+	T1=time.perf_counter()
+	if num_processes==1:
+		results=[RunSessions(**jobs[0])]
+	else:
+		with multiprocessing.get_context("spawn").Pool(num_processes) as pool:
+			results=pool.map(RunSessionsInProcess, jobs)
+	sec=time.perf_counter()-T1
+
+	first=sum([it["latencies"]["first"] for it in results],[])
+	final=sum([it["latencies"]["final"] for it in results],[])
+	report={
+		"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"versions": GetVersions(),
+		"args": vars(args),
+		"url": url,
+		"sec": sec,
+		"num_interactions": len(final),
+		"num_timeouts": sum(it["num_timeouts"] for it in results),
+		"latency_to_first_refinement_sec": Percentiles(first),
+		"latency_to_final_refinement_sec": Percentiles(final),
+		"processes": [{k:v for k,v in it.items() if k!="latencies"} for it in results],
+	}
+
+	body=json.dumps(report, indent=2)
+	if args.output:
+		with open(args.output,"w") as f: f.write(body)
+	else:
+		print(body)
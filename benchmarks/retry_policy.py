@@ -0,0 +1,77 @@
+import os,sys,time,json,random,shutil,argparse,tempfile,threading,concurrent.futures
+
+import numpy as np
+
+from openvisuspy.download import HttpSource
+from openvisuspy.retry    import RetryPolicy
+from openvisuspy.standin  import StandInServer,FaultInjector
+
+# ////////////////////////////////////////////////////////////
+def RunRequests(url, size, policy, num_requests, num_threads, range_size=4096):
+
+	# one session per thread (requests.Session is not meant to be shared)
+	local=threading.local()
+	def ReadRange(start):
+		if not hasattr(local,"source"):
+			local.source=HttpSource(url)
+		return local.source.readRange(start, start+range_size)
+
+	latencies,failures=[],0
+	def Fetch(I):
+		start=random.randrange(0, size-range_size)
+		t1=time.time()
+		try:
+			policy.call(ReadRange, start)
+			return time.time()-t1
+		except Exception:
+			return None
+
+	T1=time.time()
+	with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+		for sec in executor.map(Fetch, range(num_requests)):
+			if sec is None:
+				failures+=1
+			else:
+				latencies.append(sec)
+	sec=time.time()-T1
+	return {
+		"sec": sec,
+		"failures": failures,
+		"p50": float(np.percentile(latencies,50)),
+		"p95": float(np.percentile(latencies,95)),
+		"p99": float(np.percentile(latencies,99)),
+		"max": float(np.max(latencies)),
+		"policy": policy.getInfo(),
+	}
+
+# ////////////////////////////////////////////////////////////
+if __name__=="__main__":
+
+	parser = argparse.ArgumentParser(description="Benchmark retries and hedged requests against a local fault-injecting HTTP stand-in (see openvisuspy.standin)")
+	parser.add_argument("--num-requests", type=int, default=1000)
+	parser.add_argument("--num-threads", type=int, default=8)
+	parser.add_argument("--latency-ms", type=float, default=5.0)
+	parser.add_argument("--stall-sec", type=float, default=1.0)
+	parser.add_argument("--stall-rate", type=float, default=0.02)
+	parser.add_argument("--error-rate", type=float, default=0.02)
+	parser.add_argument("--seed", type=int, default=0)
+	args = parser.parse_args()
+
+	root=tempfile.mkdtemp()
+	os.makedirs(os.path.join(root,"bucket"))
+	size=1024*1024
+	with open(os.path.join(root,"bucket","object"),"wb") as f:
+		f.write(os.urandom(size))
+
+	def RunWith(policy):
+		faults=FaultInjector(latency=args.latency_ms/1000.0, stall=args.stall_sec, stall_rate=args.stall_rate, error_rate=args.error_rate, seed=args.seed)
+		with StandInServer(root, faults=faults) as server:
+			return dict(RunRequests(f"{server.getUrl()}/bucket/object", size, policy, args.num_requests, args.num_threads), standin=server.getInfo())
+
+	print(json.dumps({
+		"args": vars(args),
+		"no-retry":      RunWith(RetryPolicy(max_attempts=1, hedge_percentile=0)),
+		"retry":         RunWith(RetryPolicy(hedge_percentile=0)),
+		"retry+hedging": RunWith(RetryPolicy()),
+	}, indent=2))
+	shutil.rmtree(root)
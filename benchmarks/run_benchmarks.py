@@ -0,0 +1,178 @@
+import os,sys,time,json,argparse,logging
+
+import numpy as np
+
+from openvisuspy import LoadDataset, ExecuteBoxQuery, ConvertDataForRendering
+from openvisuspy.standin import StandInServer, AddFaultArguments, CreateFaultInjector
+
+from synthetic import CreateSyntheticDatasets
+from common    import GetVersions, Summarize, MeasurePeakMemory, CreateHeadlessSlice, RunSliceUntilFinished
+
+logger = logging.getLogger("benchmarks")
+
+# ////////////////////////////////////////////////////////////
+def GetQueryBoxes(db):
+	"""
+	typical boxes asked by a Slice: the full box in 1D/2D, a slice in the middle and a sub-volume in 3D
+	"""
+	pdim=db.getPointDim()
+	dims=[int(it) for it in db.getLogicSize()]
+	if pdim<=2:
+		return {"full": ([0]*pdim, dims)}
+	W,H,D=dims
+	return {
+		"z-slice": ([0,0,D//2],[W,H,D//2+1]),
+		"sub-volume": ([W//4,H//4,D//4],[3*W//4,3*H//4,3*D//4]),
+	}
+
+# ////////////////////////////////////////////////////////////
+def RunQuery(db, **kwargs):
+	T1=time.perf_counter()
+	ttfr,nbytes,num_results,H=None,0,0,None
+	for result in ExecuteBoxQuery(db, **kwargs):
+		if ttfr is None: ttfr=time.perf_counter()-T1
+		nbytes+=int(result["data"].nbytes)
+		num_results+=1
+		H=result["H"]
+	return {"ttfr":ttfr, "total":time.perf_counter()-T1, "nbytes":nbytes, "num_results":num_results, "H":H}
+
+# ////////////////////////////////////////////////////////////
+def BenchExecuteBoxQuery(db, repeat, width, height, num_refinements):
+	ret={}
+	max_pixels=width if db.getPointDim()==1 else width*height # a signal is rendered on the canvas width
+	for box_name,logic_box in GetQueryBoxes(db).items():
+		full_dim=box_name=="sub-volume"
+		for mode,kwargs in [
+			("view-dependent", dict(max_pixels=max_pixels, num_refinements=num_refinements)),
+			("full-res",       dict(endh=db.getMaxResolution(), num_refinements=1)),
+		]:
+			if db.getPointDim()==1 and mode=="full-res":
+				continue # not supported by Signal1DDataset (i.e. always pyramid-based)
+			runs=[RunQuery(db, logic_box=logic_box, full_dim=full_dim, **kwargs) for I in range(repeat)]
+			ret[f"{box_name}/{mode}"]={
+				"time_to_first_refinement_sec": Summarize([it["ttfr"] for it in runs]),
+				"time_to_final_sec": Summarize([it["total"] for it in runs]),
+				"throughput_mb_sec": Summarize([it["nbytes"]/it["total"]/(1024*1024) for it in runs if it["total"]>0]),
+				"num_refinements": runs[-1]["num_results"],
+				"final_resolution": runs[-1]["H"],
+				"nbytes": runs[-1]["nbytes"],
+				"peak_memory_bytes": MeasurePeakMemory(lambda: RunQuery(db, logic_box=logic_box, full_dim=full_dim, **kwargs)),
+			}
+			logger.info(f"ExecuteBoxQuery {box_name}/{mode} {ret[f'{box_name}/{mode}']}")
+	return ret
+
+# ////////////////////////////////////////////////////////////
+def BenchCreateBoxQuery(db, repeat, max_pixels):
+	if db.getPointDim()==1: return None
+	logic_box=list(GetQueryBoxes(db).values())[0]
+	N=20*repeat
+	T1=time.perf_counter()
+	for I in range(N):
+		db.createBoxQuery(logic_box=logic_box, max_pixels=max_pixels, num_refinements=3)
+	return {"usec_per_call": 1e6*(time.perf_counter()-T1)/N}
+
+# ////////////////////////////////////////////////////////////
+def BenchConvertDataForRendering(repeat, width=1024, height=1024):
+	ret={}
+	for name,shape,dtype in [
+		("uint8",      (height,width),   np.uint8),
+		("uint8[3]",   (height,width,3), np.uint8),
+		("uint8[4]",   (height,width,4), np.uint8),
+		("float32",    (height,width),   np.float32),
+		("float32[3]", (height,width,3), np.float32),
+		("float64",    (height,width),   np.float64),
+	]:
+		data=(np.random.default_rng(0).random(shape)*255).astype(dtype)
+		times=[]
+		for I in range(repeat):
+			T1=time.perf_counter()
+			ConvertDataForRendering(data)
+			times.append(time.perf_counter()-T1)
+		ret[name]={
+			"shape":list(shape),
+			"msec": Summarize([1000*it for it in times]),
+			"peak_memory_bytes": MeasurePeakMemory(lambda: ConvertDataForRendering(data))
+		}
+	return ret
+
+# ////////////////////////////////////////////////////////////
+def BenchSlice(url, repeat, width, height):
+	slice=CreateHeadlessSlice(url, width=width, height=height)
+	ret={"open": RunSliceUntilFinished(slice)}
+
+	# pan by 10% of the viewport (i.e. what a user would do with the mouse)
+	pans=[]
+	for I in range(repeat):
+		x,y,w,h=slice.canvas.getViewport()
+		dx=0.1*w*(1 if I%2==0 else -1)
+		slice.canvas.setViewport([x+dx,y,w,h])
+		slice.canvas.onIdle()
+		pans.append(RunSliceUntilFinished(slice))
+	slice.stop()
+	return {
+		"open_time_to_first_refinement_sec": ret["open"][0] if ret["open"] else None,
+		"open_time_to_final_sec": ret["open"][1] if ret["open"] else None,
+		"pan_time_to_first_refinement_sec": Summarize([it[0] for it in pans if it]),
+		"pan_time_to_final_sec": Summarize([it[1] for it in pans if it]),
+		"num_timeouts": len([it for it in pans if it is None])
+	}
+
+# ////////////////////////////////////////////////////////////
+if __name__=="__main__":
+
+	parser = argparse.ArgumentParser(description="Headless openvisuspy benchmarks on locally generated synthetic datasets")
+	parser.add_argument("--datasets-dir", default=os.path.expanduser("~/visus/benchmark-datasets"), help="where synthetic datasets are generated (and reused)")
+	parser.add_argument("--scale", default="small", choices=["small","large"])
+	parser.add_argument("--repeat", type=int, default=5)
+	parser.add_argument("--width", type=int, default=1024, help="canvas width in pixels")
+	parser.add_argument("--height", type=int, default=768, help="canvas height in pixels")
+	parser.add_argument("--num-refinements", type=int, default=3)
+	parser.add_argument("--only", default="", help="comma separated dataset names to run")
+	parser.add_argument("--skip-slice", action="store_true", help="do not run the headless Slice benchmark")
+	parser.add_argument("--output", default="", help="JSON output filename (default stdout)")
+	parser.add_argument("--serve", default="", choices=["","mod_visus","s3"], help="read the idx datasets through a local stand-in server (see openvisuspy.standin)")
+	parser.add_argument("--cached", default="", help="`cached` param of the served urls (e.g. idx or arco)")
+	AddFaultArguments(parser)
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+	report={
+		"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"versions": GetVersions(),
+		"args": vars(args),
+		"convert_data_for_rendering": BenchConvertDataForRendering(args.repeat),
+		"datasets": {}
+	}
+
+	server=None
+	if args.serve:
+		server=StandInServer(args.datasets_dir, faults=CreateFaultInjector(args)).start()
+
+	only=[it for it in args.only.split(",") if it]
+	for spec,url in CreateSyntheticDatasets(args.datasets_dir, args.scale):
+		if only and spec["name"] not in only: continue
+		if server is not None and url.endswith(".idx"):
+			url=server.getModVisusUrl(spec["name"], cached=args.cached) if args.serve=="mod_visus" else server.getS3Url(url, cached=args.cached)
+		logger.info(f"Running benchmarks on {spec['name']} url={url}")
+		db=LoadDataset(url)
+		item={
+			"spec": spec,
+			"execute_box_query": BenchExecuteBoxQuery(db, args.repeat, args.width, args.height, args.num_refinements),
+			"create_box_query": BenchCreateBoxQuery(db, args.repeat, args.width*args.height),
+		}
+		if not args.skip_slice:
+			item["slice"]=BenchSlice(url, args.repeat, args.width, args.height)
+		db.close()
+		report["datasets"][spec["name"]]=item
+
+	if server is not None:
+		report["standin"]=server.getInfo()
+		server.stop()
+
+	body=json.dumps(report, indent=2)
+	if args.output:
+		with open(args.output,"w") as f: f.write(body)
+		logger.info(f"Report written to {args.output}")
+	else:
+		print(body)
@@ -0,0 +1,59 @@
+import os,sys,time,json,shutil,argparse,tempfile,concurrent.futures
+
+import boto3
+
+from openvisuspy.s3      import S3ClientPool
+from openvisuspy.standin import StandInServer,AddFaultArguments,CreateFaultInjector
+
+# ////////////////////////////////////////////////////////////
+def RunRequests(get_client, num_objects, num_threads):
+	def Fetch(I):
+		client=get_client()
+		client.head_object(Bucket="bucket", Key=f"object-{I}")
+		return len(client.get_object(Bucket="bucket", Key=f"object-{I}", Range="bytes=0-4095")["Body"].read())
+	T1=time.time()
+	with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+		tot=sum(executor.map(Fetch, range(num_objects)))
+	sec=time.time()-T1
+	return {"sec": sec, "objects_per_sec": num_objects/sec, "bytes": tot}
+
+# ////////////////////////////////////////////////////////////
+if __name__=="__main__":
+
+	parser = argparse.ArgumentParser(description="Benchmark pooled vs per-request boto3 S3 clients against a local S3 stand-in")
+	parser.add_argument("--num-objects", type=int, default=200)
+	parser.add_argument("--num-threads", type=int, default=8)
+	AddFaultArguments(parser)
+	args = parser.parse_args()
+
+	os.environ.setdefault("AWS_ACCESS_KEY_ID","any")
+	os.environ.setdefault("AWS_SECRET_ACCESS_KEY","any")
+	os.environ.setdefault("AWS_DEFAULT_REGION","us-east-1")
+
+	# bucket/object-{I} served by the local S3 stand-in
+	root=tempfile.mkdtemp()
+	os.makedirs(os.path.join(root,"bucket"))
+	body=os.urandom(64*1024)
+	for I in range(args.num_objects):
+		with open(os.path.join(root,"bucket",f"object-{I}"),"wb") as f:
+			f.write(body)
+	server=StandInServer(root, faults=CreateFaultInjector(args)).start()
+	endpoint_url=server.getUrl()
+
+	def NewClient():
+		return boto3.session.Session().client("s3", endpoint_url=endpoint_url, verify=False)
+
+	pool=S3ClientPool()
+	def PooledClient():
+		return pool.getClient(endpoint_url=endpoint_url, verify=False)
+
+	print(json.dumps({
+		"endpoint_url": endpoint_url,
+		"num_objects": args.num_objects,
+		"num_threads": args.num_threads,
+		"new-client-per-request": RunRequests(NewClient, args.num_objects, args.num_threads),
+		"pooled-client": RunRequests(PooledClient, args.num_objects, args.num_threads),
+		"standin": server.getInfo(),
+	}, indent=2))
+	server.stop()
+	shutil.rmtree(root)
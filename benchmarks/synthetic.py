@@ -0,0 +1,99 @@
+import os,sys,logging
+import numpy as np
+
+import OpenVisus as ov
+
+logger = logging.getLogger(__name__)
+
+# name -> spec (dims are in OpenVisus order i.e. [W,H,D])
+DATASETS={
+	"small": [
+		{"name":"2d-uint8-1024",             "dims":[1024,1024],     "dtype":"uint8"},
+		{"name":"2d-uint8[3]-1024",          "dims":[1024,1024],     "dtype":"uint8[3]"},
+		{"name":"2d-float32-1024",           "dims":[1024,1024],     "dtype":"float32"},
+		{"name":"2d-float32-1024-xfirst",    "dims":[1024,1024],     "dtype":"float32", "bitmask":"V"+"0"*10+"1"*10},
+		{"name":"3d-uint16-256",             "dims":[256,256,256],   "dtype":"uint16"},
+		{"name":"3d-float32-256x256x64-t4",  "dims":[256,256,64],    "dtype":"float32", "timesteps":4},
+		{"name":"1d-int64-1M",               "num_samples":1<<20,    "dtype":"int64"},
+	],
+	"large": [
+		{"name":"2d-uint8-4096",             "dims":[4096,4096],     "dtype":"uint8"},
+		{"name":"2d-float32-4096",           "dims":[4096,4096],     "dtype":"float32"},
+		{"name":"2d-float32-4096-xfirst",    "dims":[4096,4096],     "dtype":"float32", "bitmask":"V"+"0"*12+"1"*12},
+		{"name":"3d-float32-512",            "dims":[512,512,512],   "dtype":"float32"},
+		{"name":"3d-float64-512x512x128-t8", "dims":[512,512,128],   "dtype":"float64", "timesteps":8},
+		{"name":"1d-int64-16M",              "num_samples":1<<24,    "dtype":"int64"},
+	]
+}
+
+# ////////////////////////////////////////////////////////////
+def GenerateData(dims, dtype, timestep=0):
+	"""
+	Smooth field plus some noise, so that compression and coarse levels behave like real data
+	"""
+	atomic,ncomponents=(dtype.split("[")[0],int(dtype.split("[")[1][:-1])) if "[" in dtype else (dtype,1)
+	shape=list(reversed(dims))
+	rng=np.random.default_rng(timestep)
+	data=np.zeros(shape,dtype=np.float32)
+	for I,N in enumerate(shape):
+		axis=np.sin(np.linspace(0, 4*np.pi*(I+1), N, dtype=np.float32) + 0.5*timestep)
+		data+=axis.reshape([N if J==I else 1 for J in range(len(shape))])
+	data+=0.1*rng.standard_normal(shape, dtype=np.float32)
+	if np.issubdtype(np.dtype(atomic), np.integer):
+		info=np.iinfo(np.dtype(atomic))
+		m,M=float(np.min(data)),float(np.max(data))
+		data=(data-m)/(M-m)*min(float(info.max),65535.0)
+	data=data.astype(atomic)
+	if ncomponents>1:
+		data=np.stack([np.roll(data,C,axis=-1) for C in range(ncomponents)],axis=-1)
+	return data
+
+# ////////////////////////////////////////////////////////////
+def CreateSyntheticIdx(dirname, name, dims, dtype, bitmask=None, timesteps=1):
+	idx_filename=os.path.join(dirname, name, "visus.idx")
+	if os.path.isfile(idx_filename):
+		return idx_filename
+
+	logger.info(f"Creating {idx_filename} dims={dims} dtype={dtype} bitmask={bitmask} timesteps={timesteps}")
+	kwargs={"url":idx_filename, "dims":dims, "fields":[ov.Field("data",dtype,"row_major")]}
+	if bitmask: kwargs["bitmask"]=bitmask
+	if timesteps>1: kwargs["time"]=[0,timesteps-1,"time_%02d/"]
+	db=ov.CreateIdx(**kwargs)
+	for T in range(timesteps):
+		db.write(GenerateData(dims, dtype, timestep=T), time=T)
+	db.compressDataset(["zip"])
+	return idx_filename
+
+# ////////////////////////////////////////////////////////////
+def CreateSyntheticSignal(dirname, name, num_samples, dtype="int64"):
+	filename=os.path.join(dirname, name, "data.npy")
+	if os.path.isfile(filename):
+		return filename
+	logger.info(f"Creating {filename} num_samples={num_samples} dtype={dtype}")
+	os.makedirs(os.path.dirname(filename),exist_ok=True)
+	t=np.linspace(0, 200*np.pi, num_samples)
+	signal=(1000*np.sin(t)+100*np.random.default_rng(0).standard_normal(num_samples)).astype(dtype)
+	np.save(filename, signal)
+	return filename
+
+# ////////////////////////////////////////////////////////////
+def CreateSyntheticDatasets(dirname, scale="small"):
+	"""
+	returns a list of (spec, url), generated datasets are reused if they already exist in `dirname`
+	"""
+	ret=[]
+	for spec in DATASETS[scale]:
+		if "num_samples" in spec:
+			url=CreateSyntheticSignal(dirname, spec["name"], spec["num_samples"], spec["dtype"])
+		else:
+			url=CreateSyntheticIdx(dirname, spec["name"], spec["dims"], spec["dtype"], bitmask=spec.get("bitmask"), timesteps=spec.get("timesteps",1))
+		ret.append((spec,url))
+	return ret
+
+# ////////////////////////////////////////////////////////////
+if __name__=="__main__":
+	logging.basicConfig(level=logging.INFO)
+	dirname=sys.argv[1] if len(sys.argv)>1 else os.path.expanduser("~/visus/benchmark-datasets")
+	scale=sys.argv[2] if len(sys.argv)>2 else "small"
+	for spec,url in CreateSyntheticDatasets(dirname, scale):
+		print(spec["name"],url)
@@ -1,7 +1,9 @@
-from .utils      import *
-from .backend    import *
-from .slice      import *
-from .probe      import *
-
-# from .create_netcdf_metadata import *
+from .utils      import *
+from .backend    import *
+from .slice      import *
+from .probe      import *
+from .trace      import *
+from .spans      import *
+
+# from .create_netcdf_metadata import *
 # from .xarray_backend import *
\ No newline at end of file
@@ -0,0 +1,107 @@
+import os,time,logging,threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGET_FIRST_SEC=float(os.environ.get("VISUS_SLICE_TARGET_FIRST_SEC",0.3))
+DEFAULT_TARGET_FINAL_SEC=float(os.environ.get("VISUS_SLICE_TARGET_FINAL_SEC",2.0))
+
+# ///////////////////////////////////////////////////////////////////
+class BandwidthEstimator:
+	"""
+	Effective throughput (decoded bytes/sec) and per-query latency of a dataset, fitted on the timings of each refinement
+	as `sec=latency+nbytes/bytes_per_sec` with exponentially decayed least squares (recent samples weight more, so it follows the link)
+	"""
+
+	# constructor
+	def __init__(self, decay=0.9, min_samples=3):
+		self.decay=decay
+		self.min_samples=min_samples
+		self.lock=threading.Lock()
+		self.num_samples=0
+		self.S0=self.Sx=self.Sy=self.Sxx=self.Sxy=0.0
+		self.bytes_per_pixel=None
+
+	# add (called by the dataset worker for each refinement)
+	def add(self, nbytes, sec, bytes_per_pixel=None):
+		if sec<=0: return
+		x,y=float(nbytes),float(sec)
+		with self.lock:
+			self.S0 =self.decay*self.S0 +1.0
+			self.Sx =self.decay*self.Sx +x
+			self.Sy =self.decay*self.Sy +y
+			self.Sxx=self.decay*self.Sxx+x*x
+			self.Sxy=self.decay*self.Sxy+x*y
+			self.num_samples+=1
+			if bytes_per_pixel:
+				self.bytes_per_pixel=bytes_per_pixel
+
+	# get (returns (latency_sec, bytes_per_sec) or None if there are not enough samples)
+	def get(self):
+		with self.lock:
+			if self.num_samples<self.min_samples or self.Sy<=0:
+				return None
+			S0,Sx,Sy,Sxx,Sxy=self.S0,self.Sx,self.Sy,self.Sxx,self.Sxy
+
+		den=S0*Sxx-Sx*Sx
+		slope=(S0*Sxy-Sx*Sy)/den if den>1e-12*S0*Sxx else 0.0
+		latency=(Sy-slope*Sx)/S0
+		if slope<=0.0 or latency<0.0:
+			# not enough variety in the sizes (or noise), use the average throughput with no latency
+			return 0.0, Sx/Sy
+		return latency, 1.0/slope
+
+	# getBudget
+	def getBudget(self, max_pixels, pdim, num_refinements, auto_refinements=True, max_refinements=4,
+		target_first_sec=DEFAULT_TARGET_FIRST_SEC, target_final_sec=DEFAULT_TARGET_FINAL_SEC, min_pixels=None):
+		"""
+		Chooses max_pixels (never more than the canvas-based `max_pixels`) and num_refinements
+		to reach the first image within `target_first_sec` and the final one within `target_final_sec`.
+		Returns (max_pixels, num_refinements, info) where info is None when there is nothing measured yet
+		"""
+		estimate=self.get()
+		if estimate is None or not max_pixels:
+			return max_pixels, num_refinements, None
+
+		latency,bytes_per_sec=estimate
+		bytes_per_pixel=self.bytes_per_pixel or 1
+
+		# each refinement is `pdim` levels coarser than the next one (i.e. roughly 1/2 of the samples in 1D, 1/4 in 2D/slices)
+		f=2.0 if pdim==1 else 4.0
+		if min_pixels is None:
+			min_pixels=256 if pdim==1 else 128*128
+		min_pixels=min(min_pixels, max_pixels)
+
+		def FirstSec(P, N):
+			return latency + (P/f**(N-1))*bytes_per_pixel/bytes_per_sec
+
+		def FinalSec(P, N):
+			return N*latency + P*bytes_per_pixel/bytes_per_sec*(f/(f-1.0) if N>1 else 1.0)
+
+		P,N=max_pixels,num_refinements
+		for I in range(2):
+			# biggest budget reaching the final image in time
+			avail=target_final_sec-N*latency
+			P=int(avail*bytes_per_sec/bytes_per_pixel*((f-1.0)/f if N>1 else 1.0)) if avail>0 else 0
+			P=min(max_pixels, max(min_pixels, P))
+
+			# fewest refinements reaching the first image in time
+			if auto_refinements:
+				N=next((it for it in range(1,max_refinements+1) if FirstSec(P,it)<=target_first_sec), max_refinements)
+
+		return P, N, {
+			"latency_sec": latency,
+			"bytes_per_sec": bytes_per_sec,
+			"first_sec": FirstSec(P,N),
+			"final_sec": FinalSec(P,N)
+		}
+
+
+# ///////////////////////////////////////////////////////////////////
+_bandwidth_estimators={}
+_bandwidth_estimators_lock=threading.Lock()
+
+def GetBandwidthEstimator(url):
+	with _bandwidth_estimators_lock:
+		if url not in _bandwidth_estimators:
+			_bandwidth_estimators[url]=BandwidthEstimator()
+		return _bandwidth_estimators[url]
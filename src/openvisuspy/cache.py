@@ -0,0 +1,188 @@
+import os,json,time,logging,sqlite3,threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR=os.environ.get("VISUS_CACHE",os.path.expanduser("~/visus/cache"))
+
+# ///////////////////////////////////////////////////////////////////
+def IsProcessAlive(pid):
+	try:
+		os.kill(pid, 0)
+		return True
+	except ProcessLookupError:
+		return False
+	except Exception:
+		return True # exists but I cannot signal it
+
+# ///////////////////////////////////////////////////////////////////
+def IsPinned(filename, pinned):
+	# `prefix` pins the file named `prefix` and the ones named `prefix.*` (i.e. `signal` pins `signal.npy` and `signal.12.npy`, not `signal2.npy`)
+	return any(filename==prefix or filename.startswith(prefix + ".") for prefix in pinned)
+
+# ///////////////////////////////////////////////////////////////////
+class CacheManager:
+	"""
+	Size-bounded LRU accounting for the VISUS_CACHE directory.
+	Entries, pins and hit/miss counters live in a sqlite index inside the cache directory,
+	so several panel server processes can share the same cache safely.
+	"""
+
+	# constructor
+	def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=None):
+		self.cache_dir=os.path.abspath(cache_dir)
+		self.max_bytes=int(os.environ.get("VISUS_CACHE_MAX_BYTES",0)) if max_bytes is None else int(max_bytes)
+		self.lock=threading.Lock()
+		os.makedirs(self.cache_dir,exist_ok=True)
+		with self.connect() as conn:
+			conn.execute("CREATE TABLE IF NOT EXISTS entries (filename TEXT PRIMARY KEY, size INTEGER, last_access REAL)")
+			conn.execute("CREATE TABLE IF NOT EXISTS pins (prefix TEXT, pid INTEGER)")
+			conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+	# connect
+	def connect(self):
+		conn=sqlite3.connect(os.path.join(self.cache_dir,"cache-index.sqlite"), timeout=60, isolation_level=None)
+		conn.execute("PRAGMA journal_mode=WAL")
+		return _Transaction(conn)
+
+	# isManaged (only files inside the cache directory are accounted)
+	def isManaged(self, filename):
+		filename=os.path.abspath(filename)
+		return filename.startswith(self.cache_dir + os.sep)
+
+	# _incrStats
+	def _incrStats(self, conn, name, value):
+		conn.execute("INSERT INTO stats(name,value) VALUES(?,?) ON CONFLICT(name) DO UPDATE SET value=value+excluded.value",(name,int(value)))
+
+	# touch (to call for a cache hit)
+	def touch(self, filename):
+		if not self.isManaged(filename): return
+		filename=os.path.abspath(filename)
+		size=os.path.getsize(filename) if os.path.isfile(filename) else 0
+		with self.lock, self.connect() as conn:
+			conn.execute("INSERT OR REPLACE INTO entries(filename,size,last_access) VALUES(?,?,?)",(filename,size,time.time()))
+			self._incrStats(conn,"hits",1)
+			self._incrStats(conn,"bytes_saved",size)
+
+	# add (to call when a new file has been written to the cache, i.e. a cache miss)
+	def add(self, filename):
+		if not self.isManaged(filename): return
+		filename=os.path.abspath(filename)
+		size=os.path.getsize(filename)
+		with self.lock, self.connect() as conn:
+			conn.execute("INSERT OR REPLACE INTO entries(filename,size,last_access) VALUES(?,?,?)",(filename,size,time.time()))
+			self._incrStats(conn,"misses",1)
+			self._incrStats(conn,"bytes_written",size)
+		self.evict()
+
+	# pin (the entries named `prefix` or `prefix.*` cannot be evicted while this process is alive)
+	def pin(self, prefix):
+		with self.lock, self.connect() as conn:
+			conn.execute("INSERT INTO pins(prefix,pid) VALUES(?,?)",(os.path.abspath(prefix),os.getpid()))
+
+	# unpin
+	def unpin(self, prefix):
+		with self.lock, self.connect() as conn:
+			conn.execute("DELETE FROM pins WHERE rowid IN (SELECT rowid FROM pins WHERE prefix=? AND pid=? LIMIT 1)",(os.path.abspath(prefix),os.getpid()))
+
+	# getPinnedPrefixes (removing pins of dead processes)
+	def getPinnedPrefixes(self, conn):
+		ret=[]
+		for prefix,pid in conn.execute("SELECT prefix,pid FROM pins").fetchall():
+			if IsProcessAlive(pid):
+				ret.append(prefix)
+			else:
+				conn.execute("DELETE FROM pins WHERE pid=?",(pid,))
+		return ret
+
+	# evict (least recently used first, skipping pinned entries)
+	def evict(self):
+		if not self.max_bytes: return 0
+		num_evicted=0
+		with self.lock, self.connect() as conn:
+			conn.execute("BEGIN IMMEDIATE")
+			total=conn.execute("SELECT COALESCE(SUM(size),0) FROM entries").fetchone()[0]
+			if total<=self.max_bytes:
+				return 0
+			pinned=self.getPinnedPrefixes(conn)
+			for filename,size in conn.execute("SELECT filename,size FROM entries ORDER BY last_access ASC").fetchall():
+				if total<=self.max_bytes: break
+				if IsPinned(filename, pinned): continue
+				try:
+					os.remove(filename)
+				except FileNotFoundError:
+					pass
+				except Exception as ex:
+					logger.info(f"Cannot evict filename={filename} {ex}")
+					continue
+				conn.execute("DELETE FROM entries WHERE filename=?",(filename,))
+				self._incrStats(conn,"bytes_evicted",size)
+				total-=size
+				num_evicted+=1
+		if num_evicted:
+			logger.info(f"Evicted {num_evicted} cache entries {json.dumps(self.getReport())}")
+		return num_evicted
+
+	# scan (index files already on disk, for example from a previous version, using their mtime)
+	def scan(self):
+		with self.lock, self.connect() as conn:
+			known=set(it[0] for it in conn.execute("SELECT filename FROM entries").fetchall())
+			for root, dirs, files in os.walk(self.cache_dir):
+				for it in files:
+					filename=os.path.join(root,it)
+					if filename in known or it.startswith("cache-index.sqlite") or it.endswith((".lock",".part",".part.json",".tmp")):
+						continue
+					st=os.stat(filename)
+					conn.execute("INSERT OR REPLACE INTO entries(filename,size,last_access) VALUES(?,?,?)",(filename,st.st_size,st.st_mtime))
+		self.evict()
+
+	# getReport
+	def getReport(self):
+		with self.lock, self.connect() as conn:
+			num_entries,total=conn.execute("SELECT COUNT(*),COALESCE(SUM(size),0) FROM entries").fetchone()
+			stats={name:value for name,value in conn.execute("SELECT name,value FROM stats").fetchall()}
+			pinned=self.getPinnedPrefixes(conn)
+		hits,misses=stats.get("hits",0),stats.get("misses",0)
+		return {
+			"cache_dir": self.cache_dir,
+			"num_entries": num_entries,
+			"total_bytes": total,
+			"max_bytes": self.max_bytes,
+			"num_pinned": len(pinned),
+			"hits": hits,
+			"misses": misses,
+			"hit_rate": hits/(hits+misses) if (hits+misses) else 0.0,
+			"bytes_saved": stats.get("bytes_saved",0),
+			"bytes_written": stats.get("bytes_written",0),
+			"bytes_evicted": stats.get("bytes_evicted",0),
+		}
+
+
+# ///////////////////////////////////////////////////////////////////
+class _Transaction:
+
+	def __init__(self, conn):
+		self.conn=conn
+
+	def __enter__(self):
+		return self.conn
+
+	def __exit__(self, exc_type, *args):
+		if self.conn.in_transaction:
+			self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+		self.conn.close()
+
+
+# ///////////////////////////////////////////////////////////////////
+_cache_managers={}
+_cache_managers_lock=threading.Lock()
+
+def GetCacheManager(cache_dir=DEFAULT_CACHE_DIR):
+	cache_dir=os.path.abspath(cache_dir)
+	with _cache_managers_lock:
+		if cache_dir not in _cache_managers:
+			# index the files already in the directory (i.e. written before the index existed) so they count against the cap
+			manager=CacheManager(cache_dir)
+			manager.scan()
+			logger.info(f"CacheManager {json.dumps(manager.getReport())}")
+			_cache_managers[cache_dir]=manager
+		return _cache_managers[cache_dir]
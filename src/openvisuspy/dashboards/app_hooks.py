@@ -1,15 +1,39 @@
-def on_server_loaded(server_context):
-	# If present, this function executes when the server starts.
-	pass
-
-def on_server_unloaded(server_context):
-	# If present, this function executes when the server shuts down.
-	pass
-
-def on_session_created(session_context):
-	# If present, this function executes when the server creates a session.
-	pass
-
-def on_session_destroyed(session_context):
-	# If present, this function executes when the server closes a session.
-	pass
\ No newline at end of file
+import os,sys,json
+
+from openvisuspy.warmup   import StartWarmUp,StopWarmUp
+from openvisuspy.sessions import GetSessionManager
+from openvisuspy.cache    import GetCacheManager
+
+# GetConfigArgument (the first argument of the app i.e. `panel serve ... --args <config>`)
+def GetConfigArgument():
+	args=sys.argv[sys.argv.index("--args")+1:] if "--args" in sys.argv else sys.argv[1:]
+	return args[0] if args else None
+
+def on_server_loaded(server_context):
+	# If present, this function executes when the server starts.
+	# warm-up: parse the config once, open the datasets and read the coarse levels of the default views (see openvisuspy.warmup)
+	config=GetConfigArgument()
+	if not config or not int(os.environ.get("VISUS_WARMUP",1)):
+		return
+	try:
+		warmup=StartWarmUp(config, timeout=float(os.environ.get("VISUS_WARMUP_TIMEOUT_SEC",60)))
+		info=warmup.getInfo()
+		print(f"Warm-up sec={info['sec']:.2f} config={config} scenes={json.dumps(info['scenes'])}")
+	except Exception as ex:
+		# sessions still work (cold)
+		print(f"Warm-up config={config} failed {ex}")
+
+def on_server_unloaded(server_context):
+	# If present, this function executes when the server shuts down.
+	print(f"Sessions {json.dumps(GetSessionManager().getInfo())}")
+	print(f"Cache {json.dumps(GetCacheManager().getReport())}")
+	StopWarmUp()
+
+def on_session_created(session_context):
+	# If present, this function executes when the server creates a session.
+	GetSessionManager().onSessionCreated(session_context.id)
+
+def on_session_destroyed(session_context):
+	# If present, this function executes when the server closes a session.
+	# stop the slices of the session and give back their threads, datasets and data (see openvisuspy.sessions)
+	GetSessionManager().destroy(session_context.id)
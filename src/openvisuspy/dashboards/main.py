@@ -7,6 +7,7 @@ import panel as pn
 
 sys.path.append('/Users/aashishpanta/Research/openvisuspy_github/openvisuspy/src')
 from openvisuspy import SetupLogger, Slice, ProbeTool, GetQueryParams
+from openvisuspy.warmup import GetWarmUp
 
 class DashboardApp:
     def __init__(self, config):
@@ -45,5 +46,9 @@ if __name__.startswith('bokeh'):
         sizing_mode="stretch_width"
     )
     config = sys.argv[1] 
+    # already parsed by the warm-up (see app_hooks.py)
+    warmup = GetWarmUp()
+    if warmup is not None and warmup.source == config:
+        config = warmup.getConfig()
     app_instance = DashboardApp(config)
     app_instance.servable().servable()
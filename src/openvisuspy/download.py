@@ -0,0 +1,255 @@
+import os,sys,time,json,logging,hashlib,threading,concurrent.futures
+
+import requests
+
+from .retry import GetRetryPolicy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NUM_THREADS=int(os.environ.get("VISUS_DOWNLOAD_NUM_THREADS",8))
+DEFAULT_PART_SIZE=int(os.environ.get("VISUS_DOWNLOAD_PART_SIZE",8*1024*1024))
+
+# ///////////////////////////////////////////////////////////////////
+class FileLock:
+	"""
+	Inter-process exclusive lock based on a `.lock` file (fcntl on posix, msvcrt on windows)
+	"""
+
+	# constructor
+	def __init__(self, filename):
+		self.filename=filename
+		self.fp=None
+
+	# acquire
+	def acquire(self):
+		os.makedirs(os.path.dirname(os.path.abspath(self.filename)),exist_ok=True)
+		self.fp=open(self.filename,"a+b")
+		if sys.platform=="win32":
+			import msvcrt
+			while True:
+				try:
+					self.fp.seek(0)
+					msvcrt.locking(self.fp.fileno(), msvcrt.LK_LOCK, 1)
+					break
+				except OSError:
+					time.sleep(0.1)
+		else:
+			import fcntl
+			fcntl.flock(self.fp.fileno(), fcntl.LOCK_EX)
+
+	# release
+	def release(self):
+		if self.fp is None: return
+		if sys.platform=="win32":
+			import msvcrt
+			self.fp.seek(0)
+			msvcrt.locking(self.fp.fileno(), msvcrt.LK_UNLCK, 1)
+		else:
+			import fcntl
+			fcntl.flock(self.fp.fileno(), fcntl.LOCK_UN)
+		self.fp.close()
+		self.fp=None
+
+	def __enter__(self):
+		self.acquire()
+		return self
+
+	def __exit__(self, *args):
+		self.release()
+
+
+# ///////////////////////////////////////////////////////////////////
+class HttpSource:
+
+	# constructor
+	def __init__(self, url, verify=False, session=None):
+		self.url=url
+		self.verify=verify
+		self.session=session or requests.Session()
+
+	# stat (returns length,etag,accept_ranges)
+	def stat(self):
+		response=self.session.head(self.url, allow_redirects=True, verify=self.verify)
+		if not response.ok:
+			return None,None,False
+		length=response.headers.get("Content-Length")
+		return (
+			int(length) if length is not None else None,
+			response.headers.get("ETag"),
+			response.headers.get("Accept-Ranges","none").lower()=="bytes"
+		)
+
+	# readRange ([start,end) bytes, failing if the object changed in the meanwhile)
+	def readRange(self, start, end, etag=None):
+		headers={"Range": f"bytes={start}-{end-1}"}
+		if etag: headers["If-Match"]=etag
+		response=self.session.get(self.url, headers=headers, verify=self.verify)
+		if response.status_code!=206:
+			raise Exception(f"Range request failed url={self.url} range={start}-{end} status_code={response.status_code}")
+		if etag and response.headers.get("ETag",etag)!=etag:
+			raise Exception(f"ETag changed during download url={self.url}")
+		return response.content
+
+	# readAll
+	def readAll(self, fp):
+		with self.session.get(self.url, stream=True, verify=self.verify) as response:
+			response.raise_for_status()
+			for chunk in response.iter_content(chunk_size=1024*1024):
+				fp.write(chunk)
+
+
+# ///////////////////////////////////////////////////////////////////
+class S3Source:
+
+	# constructor
+	def __init__(self, client, bucket_name, key):
+		self.client=client
+		self.bucket_name=bucket_name
+		self.key=key
+
+	# stat
+	def stat(self):
+		head=self.client.head_object(Bucket=self.bucket_name, Key=self.key)
+		return int(head["ContentLength"]), head.get("ETag"), True
+
+	# readRange
+	def readRange(self, start, end, etag=None):
+		kwargs={"IfMatch":etag} if etag else {}
+		response=self.client.get_object(Bucket=self.bucket_name, Key=self.key, Range=f"bytes={start}-{end-1}", **kwargs)
+		return response["Body"].read()
+
+	# readAll
+	def readAll(self, fp):
+		self.client.download_fileobj(self.bucket_name, self.key, fp)
+
+
+# ///////////////////////////////////////////////////////////////////
+def IsMD5ETag(etag):
+	etag=(etag or "").strip('"')
+	return len(etag)==32 and all(c in "0123456789abcdef" for c in etag.lower())
+
+# ///////////////////////////////////////////////////////////////////
+def ComputeMD5(filename):
+	ret=hashlib.md5()
+	with open(filename,"rb") as f:
+		for chunk in iter(lambda: f.read(1024*1024), b""):
+			ret.update(chunk)
+	return ret.hexdigest()
+
+# ///////////////////////////////////////////////////////////////////
+class DownloadEngine:
+	"""
+	Download a remote object as parallel byte ranges into a `.part` file, then rename it atomically to its final name.
+	Completed ranges are recorded in a `.part.json` state file so that an interrupted download resumes where it stopped
+	(as long as length and ETag did not change). A `.lock` file makes concurrent sessions share one transfer, it is removed once the file is complete.
+	"""
+
+	# constructor
+	def __init__(self, num_threads=DEFAULT_NUM_THREADS, part_size=DEFAULT_PART_SIZE, verify_md5=True, retry_policy=None):
+		self.num_threads=num_threads
+		self.part_size=part_size
+		self.verify_md5=verify_md5
+		self.retry_policy=retry_policy
+
+	# download
+	def download(self, source, local_filename):
+
+		if os.path.isfile(local_filename):
+			return local_filename
+
+		os.makedirs(os.path.dirname(os.path.abspath(local_filename)),exist_ok=True)
+
+		with FileLock(local_filename + ".lock") as lock:
+
+			# someone else completed the transfer while I was waiting
+			if os.path.isfile(local_filename):
+				logger.info(f"Transfer completed by another session local_filename={local_filename}")
+				return local_filename
+
+			T1=time.time()
+			part_filename=local_filename + ".part"
+			length,etag,accept_ranges=source.stat()
+
+			if length is not None and accept_ranges and length>self.part_size:
+				self._downloadRanges(source, part_filename, length, etag)
+			else:
+				with open(part_filename,"wb") as fp:
+					source.readAll(fp)
+
+			# verify
+			if length is not None and os.path.getsize(part_filename)!=length:
+				os.remove(part_filename)
+				raise Exception(f"Wrong length for local_filename={local_filename} expected={length} got={os.path.getsize(part_filename)}")
+
+			if self.verify_md5 and isinstance(source,S3Source) and IsMD5ETag(etag) and ComputeMD5(part_filename)!=etag.strip('"'):
+				os.remove(part_filename)
+				raise Exception(f"Wrong md5 for local_filename={local_filename} etag={etag}")
+
+			os.replace(part_filename, local_filename)
+			state_filename=part_filename + ".json"
+			if os.path.isfile(state_filename):
+				os.remove(state_filename)
+
+			# the file is there, whoever comes next (or is waiting for the lock) does not need the lock file any more
+			try:
+				os.remove(lock.filename)
+			except OSError:
+				pass # windows cannot remove an open file
+
+			sec=max(time.time()-T1,1e-8)
+			logger.info(f"Downloaded local_filename={local_filename} length={length} sec={sec:.2f} ")
+
+		return local_filename
+
+	# _downloadRanges
+	def _downloadRanges(self, source, part_filename, length, etag):
+
+		state_filename=part_filename + ".json"
+		parts=[(start, min(start+self.part_size,length)) for start in range(0, length, self.part_size)]
+
+		# try to resume
+		done=set()
+		try:
+			with open(state_filename,"r") as f:
+				state=json.load(f)
+			if os.path.isfile(part_filename) and [state["length"],state["etag"],state["part_size"]]==[length,etag,self.part_size]:
+				done=set(state["done"])
+				logger.info(f"Resuming download part_filename={part_filename} done={len(done)}/{len(parts)}")
+		except Exception:
+			pass
+
+		if not done:
+			with open(part_filename,"wb") as fp:
+				fp.truncate(length)
+
+		lock=threading.Lock()
+
+		# ranges are idempotent reads, retried and hedged (see RetryPolicy)
+		policy=self.retry_policy or GetRetryPolicy(getattr(source,"url",None))
+
+		def ReadPart(start, end):
+			body=source.readRange(start, end, etag=etag)
+			if len(body)!=(end-start):
+				raise Exception(f"Wrong range length part_filename={part_filename} range={start}-{end} got={len(body)}")
+			return body
+
+		def WriteState():
+			tmp_filename=state_filename + ".tmp"
+			with open(tmp_filename,"w") as f:
+				json.dump({"length":length, "etag":etag, "part_size":self.part_size, "done":sorted(done)}, f)
+			os.replace(tmp_filename, state_filename)
+
+		def DownloadPart(I):
+			start,end=parts[I]
+			body=policy.call(ReadPart, start, end)
+			with open(part_filename,"r+b") as fp:
+				fp.seek(start)
+				fp.write(body)
+			with lock:
+				done.add(I)
+				WriteState()
+
+		todo=[I for I in range(len(parts)) if I not in done]
+		with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+			for future in [executor.submit(DownloadPart, I) for I in todo]:
+				future.result()
@@ -0,0 +1,196 @@
+import os,time,logging,threading,collections,traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .utils   import ConvertDataForRendering
+from .backend import Aborted,LoadDataset,ExecuteBoxQuery
+
+logger = logging.getLogger(__name__)
+
+# ///////////////////////////////////////////////////////////////////
+class PlayEngine:
+	"""
+	Pipelined play: a pool of workers fetches, scans and converts the next `buffer_size` timesteps while the current one is shown,
+	so that frame N+1 overlaps the display of frame N.
+	Frames are shown at `fps` (0 means as soon as they are ready). When fetching cannot keep up, late frames are dropped
+	(i.e. the newest ready frame which is due is shown) and the next frames are fetched at a coarser resolution
+	"""
+
+	# constructor
+	def __init__(self, url, timesteps, field, logic_box, pdim, max_pixels=None, endh=None, fps=10.0, num_workers=2, buffer_size=4, max_coarsen=4):
+		self.url=url
+		self.timesteps=list(timesteps)
+		self.field=field
+		self.logic_box=logic_box
+		self.pdim=pdim
+		self.max_pixels=max_pixels
+		self.endh=endh
+		self.fps=fps
+		self.num_workers=num_workers
+		self.buffer_size=max(buffer_size,num_workers)
+		self.max_coarsen=max_coarsen
+
+		self.lock=threading.Lock()
+		self.aborted=Aborted()
+		self.stopped=False
+		self.local=threading.local()
+		self.datasets=[]
+		self.executor=ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="play")
+		self.futures={}
+
+		# each coarsen step is `pdim` levels less (i.e. 1/2 of the samples of a signal, 1/4 of the pixels of an image)
+		self.coarsen=0
+		self.last_coarsen_change=0
+		self.fetch_sec=None
+
+		self.t0=None
+		self.next_index=0
+		self.num_shown=0
+		self.num_dropped=0
+		self.num_late=0
+		self.show_times=collections.deque(maxlen=64)
+
+	# start
+	def start(self):
+		self.t0=time.time()
+		self.fill()
+
+	# stop
+	def stop(self):
+		self.stopped=True
+		self.aborted.setTrue()
+		for future in self.futures.values():
+			future.cancel()
+		self.executor.shutdown(wait=True)
+		self.futures={}
+		for db in self.datasets:
+			db.close()
+		self.datasets=[]
+
+	# getDataset (each worker has its own dataset object, the heavy part is shared, see DatasetPool)
+	def getDataset(self):
+		db=getattr(self.local,"db",None)
+		if db is None:
+			db=LoadDataset(self.url)
+			with self.lock:
+				self.datasets.append(db)
+			self.local.db=db
+		return db
+
+	# fill (keep `buffer_size` frames fetched or in flight)
+	def fill(self):
+		for index in range(self.next_index, self.next_index+self.buffer_size):
+			if index not in self.futures:
+				self.futures[index]=self.executor.submit(self.fetchFrame, self.timesteps[index % len(self.timesteps)], self.coarsen)
+
+	# fetchFrame (worker thread)
+	def fetchFrame(self, timestep, coarsen):
+		try:
+			return self.doFetchFrame(timestep, coarsen)
+		except:
+			if not self.stopped:
+				logger.error(f"Play fetch timestep={timestep} failed {traceback.format_exc()}")
+			return None
+
+	# doFetchFrame
+	def doFetchFrame(self, timestep, coarsen):
+		t1=time.time()
+		db=self.getDataset()
+		# max_pixels is what is on the screen: 1D a signal, 2D and 3D (a slice) an image
+		max_pixels=self.max_pixels//(2**(min(self.pdim,2)*coarsen)) if self.max_pixels else None
+		endh=max(self.endh-self.pdim*coarsen,0) if self.endh is not None else None
+		result=None
+		for result in ExecuteBoxQuery(db, timestep=timestep, field=self.field, logic_box=self.logic_box, max_pixels=max_pixels, endh=endh, num_refinements=1, aborted=self.aborted):
+			pass
+		if result is None:
+			return None
+		data=result["data"]
+		try:
+			result["data_range"]=(np.min(data),np.max(data))
+		except:
+			result["data_range"]=(0.0,0.0)
+		if self.pdim>1:
+			result["img"]=ConvertDataForRendering(data)
+		result["running"]=False
+		result["fetch_sec"]=time.time()-t1
+		result["coarsen"]=coarsen
+		return result
+
+	# adapt (one resolution step at a time, at most once per buffer)
+	def adapt(self, fetch_sec):
+		self.fetch_sec=fetch_sec if self.fetch_sec is None else 0.7*self.fetch_sec+0.3*fetch_sec
+		if not self.fps or (self.num_shown-self.last_coarsen_change)<self.buffer_size:
+			return
+		interval=1.0/self.fps
+		effective=self.fetch_sec/self.num_workers
+		if effective>interval and self.coarsen<self.max_coarsen:
+			self.coarsen+=1
+		elif effective<0.4*interval and self.coarsen>0:
+			self.coarsen-=1
+		else:
+			return
+		self.last_coarsen_change=self.num_shown
+		logger.info(f"Play coarsen={self.coarsen} fetch_sec={self.fetch_sec:.3f} fps={self.fps}")
+
+	# getFrame (returns the frame to show now, or None)
+	def getFrame(self):
+		now=time.time()
+		due=int((now-self.t0)*self.fps) if self.fps else self.next_index
+		if self.next_index>due:
+			return None
+
+		# behind schedule: show the newest ready frame which is due, dropping the previous ones
+		index=None
+		for I in range(min(due,self.next_index+self.buffer_size-1), self.next_index-1, -1):
+			future=self.futures.get(I)
+			if future is not None and future.done():
+				index=I
+				break
+		if index is None:
+			return None
+
+		for I in range(self.next_index, index):
+			self.futures.pop(I).cancel()
+			self.num_dropped+=1
+		if index<due:
+			self.num_late+=1
+
+		frame=self.futures.pop(index).result()
+		self.next_index=index+1
+
+		# fell way behind (e.g. a slow frame), restart the schedule instead of dropping everything
+		if self.fps and (due-self.next_index)>self.buffer_size:
+			self.t0=now-self.next_index/self.fps
+
+		if frame is not None:
+			frame["timestep_index"]=index
+			self.num_shown+=1
+			self.show_times.append(now)
+			self.adapt(frame["fetch_sec"])
+		self.fill()
+		return frame
+
+	# getAchievedFps
+	def getAchievedFps(self):
+		if len(self.show_times)<2: return 0.0
+		sec=self.show_times[-1]-self.show_times[0]
+		return (len(self.show_times)-1)/sec if sec>0 else 0.0
+
+	# getStats
+	def getStats(self):
+		return {
+			"fps": self.getAchievedFps(),
+			"target_fps": self.fps,
+			"shown": self.num_shown,
+			"dropped": self.num_dropped,
+			"late": self.num_late,
+			"coarsen": self.coarsen,
+			"fetch_sec": self.fetch_sec,
+		}
+
+	# getInfo
+	def getInfo(self):
+		stats=self.getStats()
+		target=f"{stats['target_fps']:.1f}" if stats['target_fps'] else "max"
+		return f"play fps={stats['fps']:.1f}/{target} shown={stats['shown']} dropped={stats['dropped']} late={stats['late']} coarsen={stats['coarsen']}"
@@ -0,0 +1,126 @@
+import os,time,logging,threading
+from concurrent.futures import wait,FIRST_COMPLETED
+
+from .backend import Aborted
+from .budget  import GetBandwidthEstimator
+from .tiles   import TileFetcher
+
+logger = logging.getLogger(__name__)
+
+# ///////////////////////////////////////////////////////////////////
+class ConcurrentRefinementsQuery:
+
+	# constructor
+	def __init__(self, timestep, field, logic_box, slice_dir, end_resolutions, aborted):
+		self.timestep=timestep
+		self.field=field
+		self.logic_box=logic_box
+		self.slice_dir=slice_dir
+		self.end_resolutions=end_resolutions
+		self.aborted=aborted
+		self.futures=[]
+		self.last=-1
+		self.t1=time.time()
+
+
+# ///////////////////////////////////////////////////////////////////
+class ConcurrentRefinementsDataset:
+	"""
+	Same query interface as the dataset, but each refinement level is an independent read issued at the same time as the others
+	(on a remote link this saves about one round trip per level compared to reading them in sequence).
+	Results never go back in resolution: a coarse level that completes after a finer one is dropped.
+	Levels are read on their own pool (not the tiles one), and each read borrows a dataset from the pool and gives it back when done
+	"""
+
+	# constructor
+	def __init__(self, db, fetcher=None):
+		self.db=db
+		self.fetcher=fetcher or GetRefinementFetcher()
+
+	# __getattr__ (everything else is the dataset)
+	def __getattr__(self, name):
+		return getattr(self.db, name)
+
+	# createBoxQuery
+	def createBoxQuery(self, timestep=None, field=None, logic_box=None, max_pixels=None, endh=None, num_refinements=1, aborted=None, full_dim=False):
+		ret=self.db.guessEndResolutions(logic_box, max_pixels=max_pixels, endh=endh, num_refinements=num_refinements, full_dim=full_dim)
+		if ret is None:
+			return None
+		logic_box,slice_dir,end_resolutions=ret
+		return ConcurrentRefinementsQuery(
+			self.db.getTimestep() if timestep is None else timestep,
+			self.db.getField() if field is None else field,
+			logic_box, slice_dir, end_resolutions,
+			Aborted() if aborted is None else aborted)
+
+	# beginBoxQuery (all the levels at once)
+	def beginBoxQuery(self, query):
+		if query is None: return
+		logger.info(f"beginBoxQuery (concurrent) timestep={query.timestep} field={query.field} logic_box={query.logic_box} end_resolutions={query.end_resolutions}")
+		url=self.db.getUrl()
+		query.futures=[self.fetcher.submit(url, query.timestep, query.field, query.logic_box, h, query.aborted) for h in query.end_resolutions]
+
+	# isQueryRunning
+	def isQueryRunning(self, query):
+		return query is not None and query.last<len(query.end_resolutions)-1 and not query.aborted.isTrue()
+
+	# getCurrentResolution
+	def getCurrentResolution(self, query):
+		return query.end_resolutions[query.last+1] if self.isQueryRunning(query) else -1
+
+	# nextBoxQuery (nothing to do, levels are already running)
+	def nextBoxQuery(self, query):
+		pass
+
+	# executeBoxQuery (waits for any level finer than the last returned one)
+	def executeBoxQuery(self, access, query, spans=None):
+		assert self.isQueryRunning(query)
+		t1=time.perf_counter()
+		pending={query.futures[I]:I for I in range(query.last+1, len(query.futures))}
+		while pending:
+			done,__=wait(list(pending.keys()), return_when=FIRST_COMPLETED)
+			ready=[pending[it] for it in done if it.result() is not None]
+			if ready:
+				break
+			# failed or aborted levels
+			for it in done: del pending[it]
+		else:
+			return None
+
+		I=max(ready)
+		for it in range(query.last+1, I):
+			query.futures[it].cancel()
+		query.last=I
+		value=query.futures[I].result()
+		data=value["data"]
+
+		# the worker thread measures the waiting time, not the read
+		GetBandwidthEstimator(self.db.getUrl()).add(data.nbytes, value["sec"], bytes_per_pixel=data.itemsize*(data.shape[-1] if data.ndim==3 else 1))
+
+		if spans is not None:
+			spans.add("io", t1, I=I)
+
+		msec=int(1000*(time.time()-query.t1))
+		logger.info(f"got data (concurrent) I={I} H={query.end_resolutions[I]} data.shape={data.shape} logic_box={value['logic_box']} ms={msec}")
+		return {
+			"I": I,
+			"timestep": query.timestep,
+			"field": query.field,
+			"logic_box": value["logic_box"],
+			"H": query.end_resolutions[I],
+			"data": data,
+			"msec": msec,
+			"nbytes_read": 0,
+		}
+
+
+# ///////////////////////////////////////////////////////////////////
+_refinement_fetcher=None
+_refinement_fetcher_lock=threading.Lock()
+
+def GetRefinementFetcher():
+	global _refinement_fetcher
+	with _refinement_fetcher_lock:
+		if _refinement_fetcher is None:
+			_refinement_fetcher=TileFetcher(int(os.environ.get("VISUS_REFINEMENTS_NUM_WORKERS",16)), thread_name_prefix="refinements")
+		return _refinement_fetcher
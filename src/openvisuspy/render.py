@@ -0,0 +1,463 @@
+import os,sys,time,json,zlib,struct,types,logging,argparse,multiprocessing,collections
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ///////////////////////////////////////////////////////////////////
+def GetRSSMb():
+	try:
+		with open("/proc/self/status") as f:
+			for line in f:
+				if line.startswith("VmRSS:"):
+					return int(line.split()[1])/1024.0
+	except:
+		pass
+	import resource
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+
+# ///////////////////////////////////////////////////////////////////
+def SavePNG(filename, rgba):
+	"""
+	(height,width,4) uint8 -> PNG (first row is the top of the image), no dependency other than zlib
+	"""
+	height,width=rgba.shape[0],rgba.shape[1]
+	raw=np.concatenate([np.zeros((height,1),dtype=np.uint8), np.ascontiguousarray(rgba,dtype=np.uint8).reshape(height,width*4)],axis=1)
+
+	def Chunk(tag, data):
+		return struct.pack(">I",len(data)) + tag + data + struct.pack(">I",zlib.crc32(tag+data) & 0xffffffff)
+
+	# write and rename, so that an interrupted run never leaves a truncated frame behind (see --skip-existing)
+	tmp=filename+".tmp"
+	with open(tmp,"wb") as f:
+		f.write(b"\x89PNG\r\n\x1a\n")
+		f.write(Chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+		f.write(Chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+		f.write(Chunk(b"IEND", b""))
+	os.replace(tmp, filename)
+
+# ///////////////////////////////////////////////////////////////////
+def GetPaletteLUT(name):
+	from .utils import GetPalettes
+	palettes=GetPalettes()
+	if name not in palettes:
+		raise Exception(f"unknown palette {name}")
+	colors=[it.lstrip("#") for it in palettes[name]]
+	return np.array([[int(it[0:2],16),int(it[2:4],16),int(it[4:6],16)] for it in colors],dtype=np.uint8)
+
+# ///////////////////////////////////////////////////////////////////
+def ApplyColormap(data, lut, vmin, vmax, is_log=False):
+	"""
+	scalar data -> (height,width,4) uint8 as the bokeh LinearColorMapper/LogColorMapper would do (NaN are transparent)
+	"""
+	data=data.astype(np.float64)
+	valid=np.isfinite(data)
+	if is_log:
+		tiny=np.finfo(np.float64).tiny
+		data=np.log10(np.maximum(data,tiny))
+		vmin,vmax=np.log10(max(vmin,tiny)),np.log10(max(vmax,tiny))
+	t=(data-vmin)/(vmax-vmin) if vmax>vmin else np.zeros_like(data)
+	t=np.clip(np.nan_to_num(t),0.0,1.0)
+	ret=np.empty(data.shape+(4,),dtype=np.uint8)
+	ret[...,0:3]=lut[(t*(len(lut)-1)).astype(np.int32)]
+	ret[...,3]=np.where(valid,255,0)
+	return ret
+
+# ///////////////////////////////////////////////////////////////////
+def LoadScene(filename, name=None):
+	"""
+	accepts the `Slice.getSceneBody()` format ({"scene": {...}}, in this case it needs a "url" or --url)
+	or a dashboard file ({"scenes": [...]}, picking the scene by name or the first one)
+	"""
+	from .utils import LoadJSON
+	body=LoadJSON(filename)
+	if "scene" in body:
+		return dict(body["scene"])
+	scenes=body.get("scenes",[])
+	if name is not None:
+		scenes=[it for it in scenes if it.get("name")==name]
+	if not scenes:
+		raise Exception(f"cannot find scene name={name} in {filename}")
+	return dict(scenes[0])
+
+# ///////////////////////////////////////////////////////////////////
+def GetLogicToPhysic(db, scene):
+	if "logic-to-physic" in scene:
+		return scene["logic-to-physic"]
+	dims=db.getLogicSize()
+	physic_box=db.getPhysicBox()
+	# see Slice.setPhysicBox
+	return [(physic_box[I][0], (physic_box[I][1]-physic_box[I][0])/dims[I]) for I in range(len(dims))]
+
+# ///////////////////////////////////////////////////////////////////
+def GetFrameLogicBox(db, logic_to_physic, direction, offset, viewport=None):
+	"""
+	same as Slice.toLogic, the viewport (x,y,w,h in physic coordinates) is the whole dataset if not specified
+	"""
+	pdim=db.getPointDim()
+	vt=[logic_to_physic[I][0] for I in range(pdim)]
+	vs=[logic_to_physic[I][1] for I in range(pdim)]
+
+	if viewport is None:
+		p1,p2=[0]*pdim,[int(it) for it in db.getLogicSize()]
+	else:
+		x,y,w,h=viewport
+		p1,p2=[x,y],[x+w,y+h]
+		if pdim==1:
+			del p1[1]
+			del p2[1]
+		elif pdim==3:
+			p1.insert(direction, 0)
+			p2.insert(direction, 0)
+		p1=[(p1[I]-vt[I])/vs[I] for I in range(pdim)]
+		p2=[(p2[I]-vt[I])/vs[I] for I in range(pdim)]
+
+	if pdim==3:
+		p1[direction]=int((offset-vt[direction])/vs[direction])
+		p2[direction]=p1[direction]+1
+	return [p1,p2]
+
+# ///////////////////////////////////////////////////////////////////
+def ParseRange(value, all_values=None, cast=int):
+	"""
+	"all", "A:B" or "A:B:S" (B included), "a,b,c" or a single value
+	"""
+	value=str(value).strip()
+	if value=="all":
+		return list(all_values)
+	if ":" in value:
+		v=[cast(it) for it in value.split(":")]
+		A,B,S=(v+[cast(1)])[0:3]
+		if S<=0: raise Exception(f"wrong step in {value}")
+		ret,it=[],A
+		while it<=B:
+			ret.append(it)
+			it=A+len(ret)*S
+		return ret
+	return [cast(it) for it in value.split(",")]
+
+
+# ///////////////////////////////////////////////////////////////////
+# worker process state (the dataset is opened once per process and reused for all its frames)
+_worker=None
+
+def _InitWorker(url, options, log_level):
+	global _worker
+	logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(message)s")
+	from .backend import LoadDataset
+	_worker=types.SimpleNamespace(
+		db=LoadDataset(url),
+		lut=GetPaletteLUT(options["palette"]) if options["palette"] else None,
+		options=options,
+		num_frames=0,
+		peak_rss_mb=0.0)
+
+# ///////////////////////////////////////////////////////////////////
+def RenderFrame(task):
+	"""
+	runs in a worker process: query the final resolution of one (timestep,offset) and write/return it
+	"""
+	from .backend import ExecuteBoxQuery
+	from .utils   import ConvertDataForRendering
+
+	options=_worker.options
+	t1=time.time()
+	result=None
+	for result in ExecuteBoxQuery(_worker.db, timestep=task["timestep"], field=options["field"], logic_box=task["logic_box"],
+		max_pixels=options["max_pixels"], endh=options["endh"], num_refinements=1):
+		pass
+	if result is None:
+		raise Exception(f"query failed timestep={task['timestep']} offset={task['offset']}")
+	data=result["data"]
+	query_sec=time.time()-t1
+
+	ret={
+		"index": task["index"],
+		"timestep": task["timestep"],
+		"offset": task["offset"],
+		"H": result["H"],
+		"shape": list(data.shape),
+		"query_sec": query_sec,
+		"nbytes": int(data.nbytes),
+	}
+
+	if options["output_npz"]:
+		ret["data"]=data
+	else:
+		img=ConvertDataForRendering(data)
+		if img.dtype==np.uint32:
+			rgba=img.view(np.uint8).reshape(img.shape+(4,))
+		else:
+			if options["range_mode"] in ("metadata","user"):
+				vmin,vmax=options["range"]
+			else:
+				vmin,vmax=float(np.nanmin(img)),float(np.nanmax(img))
+			rgba=ApplyColormap(img, _worker.lut, vmin, vmax, is_log=options["color_mapper_type"]=="log")
+		# bokeh image origin is bottom-left
+		SavePNG(task["filename"], np.flipud(rgba))
+		ret["filename"]=task["filename"]
+
+	_worker.num_frames+=1
+	_worker.peak_rss_mb=max(_worker.peak_rss_mb, GetRSSMb())
+	ret["pid"]=os.getpid()
+	ret["rss_mb"]=_worker.peak_rss_mb
+	ret["sec"]=time.time()-t1
+	return ret
+
+
+# ///////////////////////////////////////////////////////////////////
+class BatchRenderer:
+	"""
+	Renders (timestep,offset) frames of a scene with a process pool, either as colormapped PNG files in a directory or as a single .npz stack.
+	 - each worker opens the dataset once and keeps it for all its frames, workers are recycled every `max_frames_per_worker` frames
+	 - at most `max_inflight` frames are queued/returned at the same time, and the .npz stack is written through a memmap,
+	   so memory does not grow with the number of frames
+	"""
+
+	# constructor
+	def __init__(self, scene, output, url=None, timesteps=None, offsets=None, width=1024, height=768, max_pixels=None, endh=None,
+		palette=None, range_mode=None, range=None, color_mapper_type=None,
+		num_workers=None, max_inflight=None, max_frames_per_worker=200, skip_existing=False, pattern="frame_{index:05d}.png", progress_sec=10.0):
+
+		from .backend import LoadDataset
+		from .utils   import DEFAULT_PALETTE
+
+		self.scene=scene
+		self.url=url or scene.get("url")
+		if not self.url:
+			raise Exception("missing dataset url (not in the scene and no --url)")
+		self.output=output
+		self.output_npz=output.endswith(".npz")
+		self.num_workers=num_workers or max(1,os.cpu_count()//2)
+		self.max_inflight=max_inflight or 2*self.num_workers
+		self.max_frames_per_worker=max_frames_per_worker
+		self.skip_existing=skip_existing
+		self.pattern=pattern
+		self.progress_sec=progress_sec
+
+		db=LoadDataset(self.url)
+		try:
+			pdim=db.getPointDim()
+			if pdim==1 and not self.output_npz:
+				raise Exception("1D datasets can only be rendered to .npz")
+
+			field=scene.get("field", db.getField())
+			direction=int(scene.get("direction",2))
+			logic_to_physic=GetLogicToPhysic(db, scene)
+
+			if offsets is None:
+				if "offset" in scene:
+					offsets=[float(scene["offset"])]
+				else:
+					vt,vs=logic_to_physic[direction] if pdim==3 else (0.0,1.0)
+					offsets=[vt+vs*(int(db.getLogicSize()[direction])//2) if pdim==3 else 0.0]
+
+			all_timesteps=[int(it) for it in db.getTimesteps()]
+			if timesteps is None:
+				timesteps=[int(scene.get("timestep",all_timesteps[0]))]
+			missing=[it for it in timesteps if it not in set(all_timesteps)]
+			if missing:
+				logger.info(f"Skipping {len(missing)} timestep(s) not in the dataset, first={missing[0]}")
+				timesteps=[it for it in timesteps if it not in set(missing)]
+
+			# view dependent: the canvas size is the pixel budget, otherwise the fixed resolution of the scene
+			if endh is None and max_pixels is None:
+				if bool(scene.get("view-dependent",True)):
+					max_pixels=width if pdim==1 else width*height
+				else:
+					endh=int(scene.get("resolution",-6))
+					if endh<0: endh=db.getMaxResolution()+endh
+
+			range_mode=range_mode or scene.get("range-mode","dynamic")
+			if range is None:
+				if range_mode=="metadata":
+					range=list(scene.get("metadata-range",db.getFieldRange(field)))
+				elif range_mode=="user":
+					range=[float(scene["range-min"]),float(scene["range-max"])]
+			elif range_mode not in ("metadata","user"):
+				range_mode="user"
+			if range_mode=="dynamic-acc":
+				# frames are rendered in parallel, there is no order to accumulate the range on
+				logger.info("range-mode dynamic-acc is not supported in batch rendering, using dynamic (use --range for a fixed one)")
+				range_mode="dynamic"
+
+			self.tasks=[]
+			for timestep in timesteps:
+				for offset in offsets:
+					index=len(self.tasks)
+					self.tasks.append({
+						"index": index,
+						"timestep": timestep,
+						"offset": offset,
+						"logic_box": GetFrameLogicBox(db, logic_to_physic, direction, offset, scene.get("viewport")),
+						"filename": None if self.output_npz else os.path.join(output, pattern.format(index=index, timestep=timestep, offset=offset)),
+					})
+		finally:
+			db.close()
+
+		self.options={
+			"field": field,
+			"max_pixels": max_pixels,
+			"endh": endh,
+			"output_npz": self.output_npz,
+			"palette": None if self.output_npz else (palette or scene.get("palette",DEFAULT_PALETTE)),
+			"range_mode": range_mode,
+			"range": range,
+			"color_mapper_type": color_mapper_type or scene.get("color-mapper-type","linear"),
+		}
+
+	# run
+	def run(self):
+
+		tasks=self.tasks
+		if not self.output_npz:
+			os.makedirs(self.output, exist_ok=True)
+			if self.skip_existing:
+				tasks=[it for it in tasks if not os.path.isfile(it["filename"])]
+
+		logger.info(f"Rendering num_frames={len(tasks)}/{len(self.tasks)} num_workers={self.num_workers} output={self.output} options={self.options}")
+
+		self.stack=None
+		self.stats={"num_frames":0, "nbytes":0, "query_sec":0.0, "peak_rss_mb":{}, "H":collections.Counter()}
+		T1=time.time()
+		self.last_progress=T1
+
+		ctx=multiprocessing.get_context("spawn") # OpenVisus is not fork-safe
+		with ctx.Pool(self.num_workers, initializer=_InitWorker, initargs=(self.url, self.options, logging.WARNING),
+			maxtasksperchild=self.max_frames_per_worker or None) as pool:
+
+			pending=collections.deque()
+			for task in tasks:
+				pending.append(pool.apply_async(RenderFrame, (task,)))
+				while len(pending)>=self.max_inflight:
+					self.onFrame(pending.popleft().get(), len(tasks), T1)
+			while pending:
+				self.onFrame(pending.popleft().get(), len(tasks), T1)
+
+		if self.output_npz:
+			self.saveStack()
+
+		sec=time.time()-T1
+		report={
+			"num_frames": self.stats["num_frames"],
+			"sec": sec,
+			"fps": self.stats["num_frames"]/sec if sec>0 else 0.0,
+			"mb_per_sec": self.stats["nbytes"]/(1024*1024)/sec if sec>0 else 0.0,
+			"query_sec": self.stats["query_sec"],
+			"H": dict(self.stats["H"]),
+			"worker_peak_rss_mb": max(self.stats["peak_rss_mb"].values()) if self.stats["peak_rss_mb"] else 0.0,
+			"num_worker_processes": len(self.stats["peak_rss_mb"]),
+			"output": self.output,
+		}
+		logger.info(f"Rendering done {json.dumps(report)}")
+		return report
+
+	# onFrame (parent process)
+	def onFrame(self, frame, num_frames, T1):
+		if self.output_npz:
+			self.writeStack(frame)
+		stats=self.stats
+		stats["num_frames"]+=1
+		stats["nbytes"]+=frame["nbytes"]
+		stats["query_sec"]+=frame["query_sec"]
+		stats["peak_rss_mb"][frame["pid"]]=frame["rss_mb"]
+		stats["H"][frame["H"]]+=1
+
+		now=time.time()
+		if (now-self.last_progress)>=self.progress_sec or stats["num_frames"]==num_frames:
+			self.last_progress=now
+			sec=now-T1
+			fps=stats["num_frames"]/sec if sec>0 else 0.0
+			eta=(num_frames-stats["num_frames"])/fps if fps>0 else float("inf")
+			logger.info(" ".join([
+				f"{stats['num_frames']}/{num_frames}",
+				f"fps={fps:.2f}",
+				f"MB/s={stats['nbytes']/(1024*1024)/sec if sec>0 else 0.0:.1f}",
+				f"eta={eta:.0f}s",
+				f"worker-rss={max(stats['peak_rss_mb'].values()):.0f}MB",
+			]))
+
+	# writeStack (frames go straight to a memmap, see saveStack)
+	def writeStack(self, frame):
+		data=frame.pop("data")
+		if self.stack is None:
+			self.stack_filename=self.output+".tmp.npy"
+			self.stack=np.lib.format.open_memmap(self.stack_filename, mode="w+", dtype=data.dtype, shape=(len(self.tasks),)+data.shape)
+			self.stack_H=np.zeros(len(self.tasks),dtype=np.int32)
+		if data.shape!=self.stack.shape[1:]:
+			raise Exception(f"frame {frame['index']} shape={data.shape} differs from {self.stack.shape[1:]}, use a fixed --endh or --max-pixels")
+		self.stack[frame["index"]]=data
+		self.stack_H[frame["index"]]=frame["H"]
+
+	# saveStack
+	def saveStack(self):
+		if self.stack is None: return
+		self.stack.flush()
+		# np.savez streams the memmap in chunks
+		np.savez(self.output,
+			data=self.stack,
+			timesteps=np.array([it["timestep"] for it in self.tasks]),
+			offsets=np.array([it["offset"] for it in self.tasks]),
+			H=self.stack_H)
+		del self.stack
+		self.stack=None
+		os.remove(self.stack_filename)
+
+
+# ///////////////////////////////////////////////////////////////////
+def _Main(args):
+
+	parser = argparse.ArgumentParser(prog="python -m openvisuspy.render", description="Headless batch rendering of a scene (PNG frames or a .npz stack)")
+	parser.add_argument("scene", help="scene JSON, as saved by Slice (getSceneBody) or a dashboard file")
+	parser.add_argument("--output", required=True, help="directory for PNG frames or a .npz filename")
+	parser.add_argument("--scene-name", default=None, help="scene to use in a dashboard file (default: the first one)")
+	parser.add_argument("--url", default=None, help="dataset url (default: the one in the scene)")
+	parser.add_argument("--timesteps", default=None, help="'all', 'A:B[:S]' (B included), 'a,b,c' (default: the scene timestep)")
+	parser.add_argument("--offsets", default=None, help="'A:B[:S]' (B included), 'a,b,c' in physic coordinates (default: the scene offset)")
+	parser.add_argument("--width", type=int, default=1024, help="canvas width, i.e. the pixel budget in view-dependent mode")
+	parser.add_argument("--height", type=int, default=768)
+	parser.add_argument("--max-pixels", type=int, default=None)
+	parser.add_argument("--endh", type=int, default=None, help="fixed resolution (overrides the pixel budget)")
+	parser.add_argument("--palette", default=None)
+	parser.add_argument("--range-mode", default=None, choices=["metadata","user","dynamic","dynamic-acc"])
+	parser.add_argument("--range", type=float, nargs=2, default=None, help="fixed colormap range")
+	parser.add_argument("--color-mapper-type", default=None, choices=["linear","log"])
+	parser.add_argument("--num-workers", type=int, default=None)
+	parser.add_argument("--max-inflight", type=int, default=None, help="frames queued or returned at the same time (default: 2*num-workers)")
+	parser.add_argument("--max-frames-per-worker", type=int, default=200, help="recycle a worker process after this many frames (0 never)")
+	parser.add_argument("--pattern", default="frame_{index:05d}.png", help="PNG filename, can use {index} {timestep} {offset}")
+	parser.add_argument("--skip-existing", action="store_true", help="do not render PNG frames already on disk (i.e. resume)")
+	parser.add_argument("--progress-sec", type=float, default=10.0)
+	parser.add_argument("--report", default=None, help="save the final report as JSON")
+	args=parser.parse_args(args)
+
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+	scene=LoadScene(args.scene, args.scene_name)
+
+	# need the dataset timesteps only for 'all'
+	timesteps=None
+	if args.timesteps is not None:
+		all_timesteps=None
+		if args.timesteps=="all":
+			from .backend import LoadDataset
+			db=LoadDataset(args.url or scene.get("url"))
+			all_timesteps=[int(it) for it in db.getTimesteps()]
+			db.close()
+		timesteps=ParseRange(args.timesteps, all_timesteps, cast=int)
+	offsets=ParseRange(args.offsets, cast=float) if args.offsets is not None else None
+
+	renderer=BatchRenderer(scene, args.output, url=args.url, timesteps=timesteps, offsets=offsets,
+		width=args.width, height=args.height, max_pixels=args.max_pixels, endh=args.endh,
+		palette=args.palette, range_mode=args.range_mode, range=args.range, color_mapper_type=args.color_mapper_type,
+		num_workers=args.num_workers, max_inflight=args.max_inflight, max_frames_per_worker=args.max_frames_per_worker,
+		skip_existing=args.skip_existing, pattern=args.pattern, progress_sec=args.progress_sec)
+	report=renderer.run()
+
+	if args.report:
+		with open(args.report,"w") as f:
+			json.dump(report, f, indent=2)
+
+# ///////////////////////////////////////////////////////////////////
+if __name__=="__main__":
+	_Main(sys.argv[1:])
@@ -0,0 +1,147 @@
+import os,time,random,logging,threading,collections
+from concurrent.futures import ThreadPoolExecutor,wait,FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# ///////////////////////////////////////////////////////////////////
+class RetryPolicy:
+	"""
+	Policy for remote reads:
+	 - retries: up to `max_attempts` calls, waiting a random time in [0, min(max_delay, base_delay*2^attempt)] (exponential backoff, full jitter)
+	 - hedging: when a call takes longer than the `hedge_percentile` of the recent latencies, the same call is issued again
+	   and the first one to complete wins (the other one is not interrupted, its result is dropped).
+	   Only for idempotent reads, and only once there are `hedge_min_samples` latencies to compute the percentile on
+	"""
+
+	# constructor
+	def __init__(self, max_attempts=None, base_delay=None, max_delay=None, hedge_percentile=None, hedge_min_delay=0.05, hedge_min_samples=20, max_hedges=1, window=200):
+		self.max_attempts    =int  (os.environ.get("VISUS_RETRY_MAX_ATTEMPTS",3))   if max_attempts     is None else max_attempts
+		self.base_delay      =float(os.environ.get("VISUS_RETRY_BASE_DELAY",0.1))   if base_delay       is None else base_delay
+		self.max_delay       =float(os.environ.get("VISUS_RETRY_MAX_DELAY",2.0))    if max_delay        is None else max_delay
+		self.hedge_percentile=float(os.environ.get("VISUS_HEDGE_PERCENTILE",95))    if hedge_percentile is None else hedge_percentile
+		self.hedge_min_delay=hedge_min_delay
+		self.hedge_min_samples=hedge_min_samples
+		self.max_hedges=max_hedges
+		self.lock=threading.Lock()
+		self.latencies=collections.deque(maxlen=window)
+		self.stats=collections.Counter()
+
+	# getBackoff (attempt is 0 for the first retry)
+	def getBackoff(self, attempt):
+		return random.uniform(0.0, min(self.max_delay, self.base_delay*(2**attempt)))
+
+	# addLatency
+	def addLatency(self, sec):
+		with self.lock:
+			self.latencies.append(sec)
+
+	# getHedgeDelay (None if hedging is disabled or there are not enough samples)
+	def getHedgeDelay(self):
+		if not self.hedge_percentile or self.max_hedges<=0:
+			return None
+		with self.lock:
+			if len(self.latencies)<self.hedge_min_samples:
+				return None
+			values=sorted(self.latencies)
+		value=values[min(len(values)-1, int(len(values)*self.hedge_percentile/100.0))]
+		return max(self.hedge_min_delay, value)
+
+	# onRetry (for callers doing the retries by themselves, see BaseDataset._threadLoop)
+	def onRetry(self):
+		with self.lock:
+			self.stats["retries"]+=1
+
+	# call
+	def call(self, fn, *args, cancelled=None, hedge=True, **kwargs):
+		"""
+		calls `fn(*args,**kwargs)` with retries (and hedging if `hedge`), `cancelled()` returning True stops retrying
+		"""
+		for attempt in range(self.max_attempts):
+			try:
+				with self.lock:
+					self.stats["calls"]+=1
+				return self.callHedged(fn, *args, **kwargs) if hedge else self.callTimed(fn, *args, **kwargs)
+			except Exception as ex:
+				if (cancelled is not None and cancelled()) or attempt==self.max_attempts-1:
+					with self.lock:
+						self.stats["failures"]+=1
+					raise
+				delay=self.getBackoff(attempt)
+				logger.info(f"{getattr(fn,'__name__',fn)} failed ({ex}), retry {attempt+1}/{self.max_attempts-1} in {delay:.2f}s")
+				self.onRetry()
+				time.sleep(delay)
+
+	# callTimed
+	def callTimed(self, fn, *args, **kwargs):
+		t1=time.time()
+		ret=fn(*args, **kwargs)
+		self.addLatency(time.time()-t1)
+		return ret
+
+	# callHedged
+	def callHedged(self, fn, *args, **kwargs):
+		delay=self.getHedgeDelay()
+		if delay is None:
+			return self.callTimed(fn, *args, **kwargs)
+
+		executor=GetHedgeExecutor()
+		t1=time.time()
+		primary=executor.submit(fn, *args, **kwargs)
+		futures=[primary]
+		error=None
+		while futures:
+			num_hedges=len(futures)-1 # duplicates still running
+			done,__=wait(futures, timeout=delay if num_hedges<self.max_hedges else None, return_when=FIRST_COMPLETED)
+
+			# too slow, issue a duplicate
+			if not done:
+				with self.lock:
+					self.stats["hedges"]+=1
+				futures.append(executor.submit(fn, *args, **kwargs))
+				continue
+
+			for future in done:
+				futures.remove(future)
+				try:
+					ret=future.result()
+				except Exception as ex:
+					error=ex
+					continue
+				self.addLatency(time.time()-t1)
+				if future is not primary:
+					with self.lock:
+						self.stats["hedge_wins"]+=1
+				return ret
+		raise error
+
+	# getInfo
+	def getInfo(self):
+		with self.lock:
+			ret=dict(self.stats)
+		ret["hedge_delay"]=self.getHedgeDelay()
+		return ret
+
+
+# ///////////////////////////////////////////////////////////////////
+_hedge_executor=None
+_retry_policies={}
+_retry_lock=threading.Lock()
+
+def GetHedgeExecutor():
+	global _hedge_executor
+	with _retry_lock:
+		if _hedge_executor is None:
+			_hedge_executor=ThreadPoolExecutor(max_workers=int(os.environ.get("VISUS_HEDGE_NUM_WORKERS",16)), thread_name_prefix="hedge")
+		return _hedge_executor
+
+# GetRetryPolicy (one per dataset url, so that the latencies of a slow link do not affect the others)
+def GetRetryPolicy(url=None):
+	with _retry_lock:
+		if url not in _retry_policies:
+			_retry_policies[url]=RetryPolicy()
+		return _retry_policies[url]
+
+# SetRetryPolicy (e.g. no hedging for a dataset which is not idempotent to read, or more attempts for a flaky one)
+def SetRetryPolicy(url, policy):
+	with _retry_lock:
+		_retry_policies[url]=policy
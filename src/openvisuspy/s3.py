@@ -0,0 +1,51 @@
+import os,logging,threading
+
+import boto3
+import botocore.config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_POOL_CONNECTIONS=int(os.environ.get("VISUS_S3_MAX_POOL_CONNECTIONS",32))
+
+# ///////////////////////////////////////////////////////////////////
+class S3ClientPool:
+	"""
+	Process-wide pool of boto3 S3 clients keyed by (profile,endpoint_url,verify).
+	Creating a session/client costs hundreds of milliseconds and loses the TCP/TLS connections,
+	while clients are thread safe and can be shared by all sessions of the process.
+	"""
+
+	# constructor
+	def __init__(self, max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS):
+		self.max_pool_connections=max_pool_connections
+		self.lock=threading.Lock()
+		self.clients={}
+
+	# getClient
+	def getClient(self, profile=None, endpoint_url=None, verify=False):
+		key=(profile, endpoint_url, verify)
+		with self.lock:
+			client=self.clients.get(key,None)
+			if client is None:
+				logger.info(f"Creating S3 client profile={profile} endpoint_url={endpoint_url} verify={verify} max_pool_connections={self.max_pool_connections}")
+				# sessions are not thread safe, so they are created under the lock and never shared
+				session=boto3.session.Session(profile_name=profile)
+				client=session.client('s3', endpoint_url=endpoint_url, verify=verify, config=botocore.config.Config(
+					max_pool_connections=self.max_pool_connections,
+					tcp_keepalive=True,
+					retries={"max_attempts": 5, "mode": "standard"}
+				))
+				self.clients[key]=client
+			return client
+
+	# clear
+	def clear(self):
+		with self.lock:
+			self.clients={}
+
+
+# ///////////////////////////////////////////////////////////////////
+_s3_client_pool=S3ClientPool()
+
+def GetS3Client(profile=None, endpoint_url=None, verify=False):
+	return _s3_client_pool.getClient(profile=profile, endpoint_url=endpoint_url, verify=verify)
@@ -0,0 +1,133 @@
+import os,json,time,types,logging,threading,collections,traceback
+
+from .utils import AddNextTickCallback
+
+logger = logging.getLogger(__name__)
+
+# ///////////////////////////////////////////////////////////////////
+class SessionManager:
+	"""
+	Live sessions of the server and the slices each one created. When a session is destroyed (i.e. the browser tab is closed, see dashboards/app_hooks.py)
+	or nobody touched it for more than `idle_timeout` seconds, its slices are closed: periodic callback, dataset worker thread, queues,
+	data and figures are given back (see Slice.close)
+	"""
+
+	# constructor
+	def __init__(self, idle_timeout=0.0, check_sec=60.0):
+		self.idle_timeout=idle_timeout
+		self.check_sec=check_sec
+		self.lock=threading.Lock()
+		self.sessions={}
+		self.stats=collections.Counter()
+		self.thread=None
+
+	# getSession (creates it if needed, must be called with the lock)
+	def getSession(self, session_id, doc=None):
+		session=self.sessions.get(session_id,None)
+		if session is None:
+			session=self.sessions[session_id]=types.SimpleNamespace(id=session_id, doc=doc, t1=time.time(), slices=[])
+			self.stats["created"]+=1
+		if doc is not None:
+			session.doc=doc
+		return session
+
+	# onSessionCreated
+	def onSessionCreated(self, session_id):
+		with self.lock:
+			self.getSession(session_id)
+
+	# register (called by the Slice constructor inside a server session)
+	def register(self, slice, session_id, doc=None):
+		with self.lock:
+			self.getSession(session_id, doc).slices.append(slice)
+			if self.idle_timeout>0 and self.thread is None:
+				self.thread=threading.Thread(target=self._threadLoop, daemon=True, name="sessions")
+				self.thread.start()
+
+	# destroy (must run on the event loop of the session, bokeh models are touched)
+	def destroy(self, session_id, reason="destroyed"):
+		with self.lock:
+			session=self.sessions.pop(session_id,None)
+		if session is None:
+			return None
+		info=self.getSessionInfo(session)
+		for slice in session.slices:
+			try:
+				slice.close()
+			except:
+				logger.error(f"SessionManager session={session_id} cannot close slice id={slice.id} {traceback.format_exc()}")
+		with self.lock:
+			self.stats[reason]+=1
+			self.stats["released_nbytes"]+=info["nbytes"]
+		logger.info(f"SessionManager {reason} session={session_id} {json.dumps(info)}")
+		return info
+
+	# getLastActivity
+	def getLastActivity(self, session):
+		return max([session.t1]+[slice.last_activity for slice in session.slices])
+
+	# isIdle (playing is not idle, the user is watching)
+	def isIdle(self, session, now):
+		if any(slice.play.is_playing for slice in session.slices):
+			return False
+		return (now-self.getLastActivity(session))>self.idle_timeout
+
+	# checkIdle
+	def checkIdle(self):
+		now=time.time()
+		with self.lock:
+			idle=[session for session in self.sessions.values() if self.isIdle(session, now)]
+		for session in idle:
+			logger.info(f"SessionManager session={session.id} idle for {now-self.getLastActivity(session):.0f} sec")
+			if session.doc is not None:
+				AddNextTickCallback(session.doc, lambda session_id=session.id: self.destroy(session_id, reason="idle"))
+			else:
+				self.destroy(session.id, reason="idle")
+
+	# _threadLoop
+	def _threadLoop(self):
+		while True:
+			time.sleep(self.check_sec)
+			try:
+				self.checkIdle()
+				logger.info(f"SessionManager {json.dumps(self.getInfo())}")
+			except:
+				logger.error(f"SessionManager {traceback.format_exc()}")
+
+	# getSessionInfo
+	def getSessionInfo(self, session):
+		now=time.time()
+		memory=[slice.getMemoryInfo() for slice in session.slices]
+		return {
+			"age_sec": int(now-session.t1),
+			"idle_sec": int(now-self.getLastActivity(session)),
+			"slices": len(session.slices),
+			"threads": sum(it["threads"] for it in memory),
+			"nbytes": sum(it["nbytes"] for it in memory),
+		}
+
+	# getInfo
+	def getInfo(self):
+		with self.lock:
+			sessions=list(self.sessions.values())
+			stats=dict(self.stats)
+		return {
+			"live": len(sessions),
+			"threads": threading.active_count(),
+			"sessions": {session.id: self.getSessionInfo(session) for session in sessions},
+			**stats,
+		}
+
+
+# ///////////////////////////////////////////////////////////////////
+_session_manager=None
+_session_manager_lock=threading.Lock()
+
+def GetSessionManager():
+	global _session_manager
+	with _session_manager_lock:
+		if _session_manager is None:
+			_session_manager=SessionManager(
+				idle_timeout=float(os.environ.get("VISUS_SESSION_IDLE_TIMEOUT_SEC",3600)),
+				check_sec=float(os.environ.get("VISUS_SESSION_CHECK_SEC",60)))
+		return _session_manager
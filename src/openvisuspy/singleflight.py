@@ -0,0 +1,169 @@
+import os,time,logging,threading,collections,traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .backend import Aborted,QueryDeadline,LoadDataset,RunBoxQuery
+
+logger = logging.getLogger(__name__)
+
+# ///////////////////////////////////////////////////////////////////
+def GetFlightKey(url, kwargs):
+	"""
+	what makes two jobs identical (the aborted object of the caller does not count)
+	"""
+	def Freeze(value):
+		if isinstance(value,(list,tuple)):
+			return tuple(Freeze(it) for it in value)
+		if isinstance(value,dict):
+			return tuple(sorted((k,Freeze(v)) for k,v in value.items()))
+		return value
+	return (url, Freeze({k:v for k,v in kwargs.items() if k!="aborted"}))
+
+
+# ///////////////////////////////////////////////////////////////////
+class Flight:
+	"""
+	One execution of a query and the sessions waiting for its progressive results. The read is aborted when nobody is waiting any more
+	"""
+
+	# constructor
+	def __init__(self, key):
+		self.key=key
+		self.url=key[0]
+		self.aborted=Aborted()
+		self.cond=threading.Condition()
+		self.results=[]
+		self.finished=False
+		self.num_subscribers=0
+		self.t1=time.time()
+
+	# publish
+	def publish(self, result):
+		with self.cond:
+			self.results.append(result)
+			self.cond.notify_all()
+
+	# finish
+	def finish(self):
+		with self.cond:
+			self.finished=True
+			self.cond.notify_all()
+
+	# iterResults (copies of the results, a late subscriber starts from the last refinement, the previous ones would be replaced immediately)
+	def iterResults(self, aborted, deadline_ms=None, keep_refining=False, poll_sec=0.02):
+
+		# the time budget of each subscriber starts when it joins, when it expires the subscriber stops waiting (see QueryDeadline)
+		expired=Aborted()
+		results=self.waitResults(aborted, expired, poll_sec)
+		if deadline_ms:
+			results=QueryDeadline(deadline_ms, expired, keep_refining=keep_refining).filter(results)
+		try:
+			for result in results:
+				# the caller does not want the final result of its deadline either
+				if aborted.isTrue(): return
+				yield result
+		finally:
+			results.close()
+
+	# waitResults
+	def waitResults(self, aborted, expired, poll_sec):
+		with self.cond:
+			I=max(0,len(self.results)-1)
+		while True:
+			with self.cond:
+				# the aborted object of the caller cannot notify, check it now and then
+				while I>=len(self.results) and not self.finished and not aborted.isTrue() and not expired.isTrue():
+					self.cond.wait(poll_sec)
+				if aborted.isTrue() or I>=len(self.results):
+					return
+				result=dict(self.results[I])
+			I+=1
+			yield result
+
+
+# ///////////////////////////////////////////////////////////////////
+class SingleFlight:
+	"""
+	Identical queries (same url, timestep, field, box, resolution...) of all the sessions of the process share one execution:
+	a query already in flight is joined and its progressive results go to every session waiting for it.
+	Each execution runs on a worker thread with its own dataset object (dataset objects keep per-query state, the heavy part is shared, see DatasetPool)
+	"""
+
+	# constructor
+	def __init__(self, num_workers):
+		self.lock=threading.Lock()
+		self.flights={}
+		self.executor=ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="singleflight")
+		self.stats=collections.Counter()
+
+	# execute (generator of the results, aborting `aborted` only stops waiting)
+	def execute(self, url, kwargs, aborted, deadline_ms=None, keep_refining=False):
+		# the deadline is applied to each subscriber, the flight keeps refining until nobody is waiting
+		key=GetFlightKey(url, kwargs)
+		with self.lock:
+			flight=self.flights.get(key,None)
+			joined=flight is not None and not flight.aborted.isTrue()
+			if not joined:
+				flight=Flight(key)
+				self.flights[key]=flight
+			flight.num_subscribers+=1
+			self.stats["joins" if joined else "executions"]+=1
+
+		if joined:
+			logger.info(f"SingleFlight joined url={url} num_subscribers={flight.num_subscribers}")
+		else:
+			kwargs={k:v for k,v in kwargs.items() if k!="aborted"}
+			self.executor.submit(self.runFlight, flight, dict(kwargs, aborted=flight.aborted))
+
+		try:
+			yield from flight.iterResults(aborted, deadline_ms=deadline_ms, keep_refining=keep_refining)
+		finally:
+			self.unsubscribe(flight)
+
+	# unsubscribe
+	def unsubscribe(self, flight):
+		with self.lock:
+			flight.num_subscribers-=1
+			if flight.num_subscribers>0 or flight.finished:
+				return
+			if self.flights.get(flight.key,None) is flight:
+				del self.flights[flight.key]
+			self.stats["aborted"]+=1
+		flight.aborted.setTrue()
+
+	# runFlight (worker thread)
+	def runFlight(self, flight, kwargs):
+		db=None
+		try:
+			if flight.aborted.isTrue():
+				return
+			# a dataset object of its own for the flight, given back at the end so that the DatasetPool can expire the url
+			db=LoadDataset(flight.url)
+			for result in RunBoxQuery(db, kwargs):
+				flight.publish(result)
+		except:
+			if not flight.aborted.isTrue():
+				logger.error(f"SingleFlight url={flight.url} failed {traceback.format_exc()}")
+		finally:
+			if db is not None:
+				db.close()
+			with self.lock:
+				if self.flights.get(flight.key,None) is flight:
+					del self.flights[flight.key]
+			flight.finish()
+
+	# getInfo
+	def getInfo(self):
+		with self.lock:
+			return dict(self.stats, in_flight=len(self.flights), subscribers=sum(it.num_subscribers for it in self.flights.values()))
+
+
+# ///////////////////////////////////////////////////////////////////
+_single_flight=None
+_single_flight_lock=threading.Lock()
+
+def GetSingleFlight():
+	global _single_flight
+	with _single_flight_lock:
+		if _single_flight is None:
+			_single_flight=SingleFlight(int(os.environ.get("VISUS_SINGLE_FLIGHT_NUM_WORKERS",64)))
+		return _single_flight
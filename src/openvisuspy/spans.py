@@ -0,0 +1,112 @@
+import os,time,json,logging,threading,collections,contextlib
+
+logger = logging.getLogger(__name__)
+
+# ///////////////////////////////////////////////////////////////////
+class JobSpans:
+	"""
+	Latency spans of one Slice job, from `Slice.refresh()` to the Bokeh update of each refinement.
+	Spans are added from both the session thread and the dataset worker thread.
+	Spans of a specific refinement have an `I` argument, the others (e.g. throttle, queue) belong to the whole job
+	"""
+
+	# constructor
+	def __init__(self, job_id, session_id=None):
+		self.job_id=job_id
+		self.session_id=session_id
+		self.t0=time.perf_counter()
+		self.t_push=None
+		self.exported=False
+		self.lock=threading.Lock()
+		self.spans=[]
+
+	# add (returns the end time, so that consecutive spans can be chained)
+	def add(self, name, t1, t2=None, **args):
+		t2=time.perf_counter() if t2 is None else t2
+		with self.lock:
+			self.spans.append({"name":name, "t1":t1, "t2":t2, "tid":threading.get_ident(), "args":args})
+		return t2
+
+	# span
+	@contextlib.contextmanager
+	def span(self, name, **args):
+		t1=time.perf_counter()
+		try:
+			yield
+		finally:
+			self.add(name, t1, **args)
+
+	# getMsec (total per stage, for a specific refinement if I is not None)
+	def getMsec(self, I=None):
+		ret=collections.OrderedDict()
+		with self.lock:
+			for it in self.spans:
+				if I is not None and it["args"].get("I",I)!=I: continue
+				ret[it["name"]]=ret.get(it["name"],0.0)+1000.0*(it["t2"]-it["t1"])
+		return {k:round(v,1) for k,v in ret.items()}
+
+	# getChromeEvents (see https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU)
+	def getChromeEvents(self):
+		pid=os.getpid()
+		with self.lock:
+			return [{
+				"name": it["name"],
+				"cat": "openvisuspy",
+				"ph": "X",
+				"ts": 1e6*it["t1"],
+				"dur": 1e6*(it["t2"]-it["t1"]),
+				"pid": pid,
+				"tid": it["tid"],
+				"args": {"session": self.session_id, "job": self.job_id, **it["args"]}
+			} for it in self.spans]
+
+
+# ///////////////////////////////////////////////////////////////////
+class SpanExporter:
+	"""
+	Exports finished jobs: one structured log line per job, an in-memory ring buffer of the last `max_jobs` jobs
+	and (if `filename` is given) a Chrome trace file (JSON array format, which can be appended and does not need the closing bracket)
+	"""
+
+	# constructor
+	def __init__(self, filename=None, max_jobs=1000):
+		self.filename=filename
+		self.lock=threading.Lock()
+		self.jobs=collections.deque(maxlen=max_jobs)
+		self.file=None
+
+	# export
+	def export(self, spans, aborted=False):
+		if spans.exported: return
+		spans.exported=True
+		logger.info("job-spans " + json.dumps({
+			"session": spans.session_id,
+			"job": spans.job_id,
+			"aborted": aborted,
+			"msec": spans.getMsec()
+		}))
+		with self.lock:
+			self.jobs.append(spans)
+			if self.filename:
+				if self.file is None:
+					is_new=not os.path.isfile(self.filename) or os.path.getsize(self.filename)==0
+					self.file=open(self.filename,"a")
+					if is_new: self.file.write("[\n")
+				for event in spans.getChromeEvents():
+					self.file.write(json.dumps(event)+",\n")
+				self.file.flush()
+
+	# saveChromeTrace (last jobs, as a complete JSON object)
+	def saveChromeTrace(self, filename):
+		with self.lock:
+			events=[event for spans in self.jobs for event in spans.getChromeEvents()]
+		with open(filename,"w") as f:
+			json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+		return len(events)
+
+
+# ///////////////////////////////////////////////////////////////////
+_span_exporter=SpanExporter(os.environ.get("VISUS_SPANS_CHROME_TRACE","") or None)
+
+def GetSpanExporter():
+	return _span_exporter
@@ -0,0 +1,378 @@
+import os,sys,time,json,random,logging,argparse,threading,traceback,collections,http.server,urllib.parse,email.utils
+
+logger = logging.getLogger(__name__)
+
+# ///////////////////////////////////////////////////////////////////
+class FaultInjector:
+	"""
+	Network conditions of the stand-in: `latency` sec (plus a random `jitter`) before each response, one shared link of `bandwidth` bytes/sec,
+	a fraction `error_rate` of the requests failing with 503 and a fraction `stall_rate` of them taking `stall` sec more (i.e. a stuck fetch).
+	With a `seed` the sequence of errors and stalls is reproducible
+	"""
+
+	# constructor
+	def __init__(self, latency=0.0, jitter=0.0, bandwidth=None, error_rate=0.0, stall_rate=0.0, stall=1.0, seed=None):
+		self.latency=latency
+		self.jitter=jitter
+		self.bandwidth=bandwidth
+		self.error_rate=error_rate
+		self.stall_rate=stall_rate
+		self.stall=stall
+		self.random=random.Random(seed)
+		self.lock=threading.Lock()
+		self.link_free=0.0
+		self.stats=collections.Counter()
+
+	# onRequest (waits the latency, returns the status to fail with or None)
+	def onRequest(self):
+		with self.lock:
+			delay=self.latency+self.random.uniform(0.0,self.jitter)
+			stalled=self.random.random()<self.stall_rate
+			failed =self.random.random()<self.error_rate
+			self.stats["requests"]+=1
+			if stalled: self.stats["stalls"]+=1
+			if failed:  self.stats["errors"]+=1
+		time.sleep(delay+(self.stall if stalled else 0.0))
+		return 503 if failed else None
+
+	# write (each chunk waits for its turn on the link)
+	def write(self, wfile, body, chunk_size=64*1024):
+		body=memoryview(body)
+		for I in range(0,len(body),chunk_size):
+			chunk=body[I:I+chunk_size]
+			if self.bandwidth:
+				with self.lock:
+					now=time.time()
+					self.link_free=max(now,self.link_free)+len(chunk)/self.bandwidth
+					wait=self.link_free-now
+				time.sleep(wait)
+			wfile.write(chunk)
+		with self.lock:
+			self.stats["bytes"]+=len(body)
+
+	# getInfo
+	def getInfo(self):
+		with self.lock:
+			return dict(self.stats)
+
+
+# ///////////////////////////////////////////////////////////////////
+def FindDatasets(root):
+	"""
+	name -> idx filename for all the idx files under `root` (the name of `<dir>/visus.idx` is `<dir>`)
+	"""
+	ret={}
+	for dirpath,__,filenames in os.walk(root):
+		for filename in filenames:
+			if not filename.endswith(".idx"): continue
+			path=os.path.join(dirpath,filename)
+			name=os.path.relpath(dirpath if filename=="visus.idx" else path[:-4], root).replace(os.sep,"/")
+			ret[name]=path
+	return ret
+
+
+# ///////////////////////////////////////////////////////////////////
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+
+	protocol_version="HTTP/1.1"
+
+	# log_message
+	def log_message(self, fmt, *args):
+		logger.debug(fmt % args)
+
+	# do_HEAD
+	def do_HEAD(self):
+		self.handleRequest(head=True)
+
+	# do_GET
+	def do_GET(self):
+		self.handleRequest(head=False)
+
+	# handleRequest
+	def handleRequest(self, head):
+		standin=self.server.standin
+		status=standin.faults.onRequest()
+		if status is not None:
+			return self.sendResponse(status, {"Content-Type":"text/plain"}, b"injected error", head)
+		try:
+			url=urllib.parse.urlparse(self.path)
+			if url.path.rstrip("/").endswith("mod_visus"):
+				params=dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+				status,headers,body=standin.handleModVisus(params)
+			else:
+				status,headers,body=standin.handleS3(urllib.parse.unquote(url.path), self.headers, head)
+		except:
+			logger.error(f"request {self.path} failed {traceback.format_exc()}")
+			status,headers,body=500,{"Content-Type":"text/plain"},b"internal error"
+		self.sendResponse(status, headers, body, head)
+
+	# sendResponse
+	def sendResponse(self, status, headers, body, head):
+		self.send_response(status)
+		headers=dict(headers)
+		headers.setdefault("Content-Length", str(len(body)))
+		for key,value in headers.items():
+			self.send_header(key, value)
+		self.end_headers()
+		if not head and body:
+			self.server.standin.faults.write(self.wfile, body)
+
+
+# ///////////////////////////////////////////////////////////////////
+class StandInServer:
+	"""
+	Local HTTP server standing in for the remote side of the network path, for benchmarks and tests without the internet:
+	 - S3 layout (path-style): HEAD/GET of `/<bucket>/<key>` with `Range` and `If-Match` is the file `<root>/<bucket>/<key>`, credentials are ignored
+	 - mod_visus layout: `/mod_visus?action=list`, `/mod_visus?action=readdataset&dataset=<name>` (the idx file) and
+	   `/mod_visus?action=readblock&dataset=<name>&field=..&time=..&block=..` (blocks read from the local dataset, sent uncompressed).
+	   With `username`/`password` requests need the `~auth_username`/`~auth_password` params (see OpenVisusDataset)
+	All the responses go through `faults` (see FaultInjector). For `cached=arco` urls the files must be in arco layout (one file per block)
+	"""
+
+	# constructor
+	def __init__(self, root, datasets=None, host="127.0.0.1", port=0, faults=None, username=None, password=None):
+		self.root=os.path.realpath(root)
+		self.datasets=FindDatasets(self.root) if datasets is None else dict(datasets)
+		self.faults=faults or FaultInjector()
+		self.username=username
+		self.password=password
+		self.lock=threading.Lock()
+		self.local=threading.local()
+		self.ov_datasets={}
+		self.httpd=http.server.ThreadingHTTPServer((host,port), StandInHandler)
+		self.httpd.daemon_threads=True
+		self.httpd.standin=self
+		self.thread=None
+
+	# start
+	def start(self):
+		self.thread=threading.Thread(target=self.httpd.serve_forever, daemon=True)
+		self.thread.start()
+		logger.info(f"StandInServer url={self.getUrl()} root={self.root} datasets={list(self.datasets)}")
+		return self
+
+	# stop
+	def stop(self):
+		self.httpd.shutdown()
+		self.httpd.server_close()
+		if self.thread is not None:
+			self.thread.join()
+			self.thread=None
+
+	# __enter__
+	def __enter__(self):
+		return self.start()
+
+	# __exit__
+	def __exit__(self, *args):
+		self.stop()
+
+	# getUrl
+	def getUrl(self):
+		host,port=self.httpd.server_address[:2]
+		return f"http://{host}:{port}"
+
+	# getModVisusUrl
+	def getModVisusUrl(self, name, cached=None):
+		url=f"{self.getUrl()}/mod_visus?dataset={urllib.parse.quote(name)}"
+		return url + (f"&cached={cached}" if cached else "")
+
+	# getS3Url (`path` is relative to the root, or a filename under the root)
+	def getS3Url(self, path, cached=None):
+		if os.path.isabs(path):
+			path=os.path.relpath(os.path.realpath(path), self.root)
+		endpoint_url=self.getUrl()
+		url=f"{endpoint_url}/{urllib.parse.quote(path.replace(os.sep,'/'))}?access_key=any&secret_key=any&endpoint_url={endpoint_url}"
+		return url + (f"&cached={cached}" if cached else "")
+
+	# getInfo
+	def getInfo(self):
+		return dict(self.faults.getInfo(), url=self.getUrl())
+
+	# handleS3
+	def handleS3(self, path, headers, head):
+		filename=os.path.realpath(os.path.join(self.root, path.lstrip("/")))
+		if not filename.startswith(self.root + os.sep) or not os.path.isfile(filename):
+			return 404, {"Content-Type":"application/xml"}, f"<Error><Code>NoSuchKey</Code><Key>{path}</Key></Error>".encode()
+
+		st=os.stat(filename)
+		etag=f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+		ret={
+			"ETag": etag,
+			"Last-Modified": email.utils.formatdate(st.st_mtime, usegmt=True),
+			"Accept-Ranges": "bytes",
+			"Content-Type": "application/octet-stream",
+		}
+
+		if headers.get("If-Match") not in (None,"*",etag):
+			return 412, {"Content-Type":"application/xml"}, b"<Error><Code>PreconditionFailed</Code></Error>"
+
+		A,B,status=0,st.st_size,200
+		if "Range" in headers:
+			A,B=ParseRange(headers["Range"], st.st_size)
+			if A is None:
+				return 416, {"Content-Range":f"bytes */{st.st_size}"}, b""
+			ret["Content-Range"]=f"bytes {A}-{B-1}/{st.st_size}"
+			status=206
+
+		if head:
+			ret["Content-Length"]=str(B-A)
+			return status, ret, b""
+
+		with open(filename,"rb") as f:
+			f.seek(A)
+			return status, ret, f.read(B-A)
+
+	# handleModVisus
+	def handleModVisus(self, params):
+		if self.username is not None and (params.get("~auth_username")!=self.username or params.get("~auth_password")!=self.password):
+			return 401, {"Content-Type":"text/plain"}, b"wrong credentials"
+
+		action=params.get("action","readdataset")
+
+		if action=="list":
+			body="<datasets>" + "".join(f'<dataset name="{name}" url="{self.getModVisusUrl(name)}" />' for name in self.datasets) + "</datasets>"
+			return 200, {"Content-Type":"application/xml"}, body.encode()
+
+		name=params.get("dataset")
+		if name not in self.datasets:
+			return 404, {"Content-Type":"text/plain"}, f"dataset {name} not found".encode()
+
+		if action in ("readdataset","read_dataset"):
+			with open(self.datasets[name],"rb") as f:
+				return 200, {"Content-Type":"text/plain"}, f.read()
+
+		if action in ("readblock","read_block"):
+			if "block" in params:
+				blocks=[int(it) for it in params["block"].replace(","," ").split()]
+			else:
+				blocks=list(range(int(params["from"]), int(params.get("to",int(params["from"])+1))))
+			timestep=params.get("time")
+			timestep=float(timestep) if timestep else None
+			field=params.get("field") or None
+
+			if len(blocks)==1:
+				block=self.readBlock(name, field, timestep, blocks[0])
+				if block is None:
+					return 404, {"Content-Type":"text/plain"}, b"block not found"
+				return 200, dict(block[0], **{"Content-Type":"application/octet-stream"}), block[1]
+
+			# multiple blocks, one part each
+			boundary="standin-visus-block"
+			body=[]
+			for blockid in blocks:
+				block=self.readBlock(name, field, timestep, blockid)
+				part_headers,part_body=block if block is not None else ({"visus-status":"404"},b"")
+				body.append(f"--{boundary}\r\n".encode())
+				body.append("".join(f"{k}: {v}\r\n" for k,v in dict(part_headers, **{"Content-Length":len(part_body), "visus-block":blockid}).items()).encode())
+				body.append(b"\r\n" + part_body + b"\r\n")
+			body.append(f"--{boundary}--\r\n".encode())
+			return 200, {"Content-Type":f"multipart/mixed; boundary={boundary}"}, b"".join(body)
+
+		return 400, {"Content-Type":"text/plain"}, f"unknown action {action}".encode()
+
+	# getDataset (OpenVisus is needed only for the mod_visus block queries)
+	def getDataset(self, name):
+		with self.lock:
+			if name not in self.ov_datasets:
+				import OpenVisus as ov
+				self.ov_datasets[name]=ov.LoadDataset(self.datasets[name])
+			return self.ov_datasets[name]
+
+	# readBlock (returns headers,body or None)
+	def readBlock(self, name, field, timestep, blockid):
+		import OpenVisus as ov
+		db=self.getDataset(name)
+
+		# one access per server thread
+		accesses=getattr(self.local,"accesses",None)
+		if accesses is None:
+			accesses=self.local.accesses={}
+		if name not in accesses:
+			accesses[name]=db.createAccess()
+
+		field=db.getField(field) if field else db.getField()
+		timestep=db.getTime() if timestep is None else timestep
+		query=db.db.createBlockQuery(blockid, field, timestep, ord('r'), ov.Aborted())
+		db.db.executeBlockQueryAndWait(accesses[name], query)
+		if not query.ok():
+			return None
+		data=ov.Array.toNumPy(query.buffer, bShareMem=False)
+		return {
+			"visus-compression": "raw",
+			"visus-dtype": query.buffer.dtype.toString(),
+			"visus-nsamples": query.buffer.dims.toString(),
+			"visus-layout": query.buffer.layout,
+		}, data.tobytes()
+
+
+# ///////////////////////////////////////////////////////////////////
+def ParseRange(value, size):
+	"""
+	`bytes=A-B`, `bytes=A-` or `bytes=-N` -> [A,B) within the file, (None,None) if not satisfiable
+	"""
+	try:
+		A,B=value.split("=",1)[1].split(",")[0].strip().split("-")
+		if not A:
+			A,B=max(size-int(B),0),size
+		else:
+			A,B=int(A),(min(int(B)+1,size) if B else size)
+	except:
+		return None,None
+	return (A,B) if 0<=A<B else (None,None)
+
+
+# ///////////////////////////////////////////////////////////////////
+def AddFaultArguments(parser):
+	parser.add_argument("--latency-ms", type=float, default=0.0, help="delay before each response")
+	parser.add_argument("--jitter-ms", type=float, default=0.0, help="random delay added to the latency")
+	parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="shared link bandwidth in MB/sec (0 unlimited)")
+	parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 503")
+	parser.add_argument("--stall-rate", type=float, default=0.0, help="fraction of requests stalling for --stall-sec")
+	parser.add_argument("--stall-sec", type=float, default=1.0)
+	parser.add_argument("--seed", type=int, default=None, help="seed for reproducible errors and stalls")
+
+# CreateFaultInjector (from the AddFaultArguments arguments)
+def CreateFaultInjector(args):
+	return FaultInjector(
+		latency=args.latency_ms/1000.0,
+		jitter=args.jitter_ms/1000.0,
+		bandwidth=args.bandwidth_mbps*1024*1024 if args.bandwidth_mbps else None,
+		error_rate=args.error_rate,
+		stall_rate=args.stall_rate,
+		stall=args.stall_sec,
+		seed=args.seed)
+
+
+# ///////////////////////////////////////////////////////////////////
+def _Main(args):
+
+	parser = argparse.ArgumentParser(prog="python -m openvisuspy.standin", description="Serve local IDX datasets over HTTP in mod_visus and S3 layouts, with injected latency, bandwidth limits and errors")
+	parser.add_argument("root", help="directory to serve (S3 keys are paths relative to it, idx files under it are mod_visus datasets)")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8080)
+	parser.add_argument("--dataset", action="append", default=[], help="name=idx_filename mod_visus dataset (default: all idx files under root)")
+	parser.add_argument("--username", default=None, help="mod_visus credentials (see MODVISUS_USERNAME/MODVISUS_PASSWORD)")
+	parser.add_argument("--password", default=None)
+	AddFaultArguments(parser)
+	args=parser.parse_args(args)
+
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+	datasets=dict(it.split("=",1) for it in args.dataset) if args.dataset else None
+	server=StandInServer(args.root, datasets=datasets, host=args.host, port=args.port, faults=CreateFaultInjector(args), username=args.username, password=args.password)
+	for name,filename in server.datasets.items():
+		print(f"{name}\n  mod_visus: {server.getModVisusUrl(name)}\n  s3:        {server.getS3Url(filename)}")
+	server.start()
+	try:
+		while True:
+			time.sleep(10.0)
+			logger.info(f"StandInServer {json.dumps(server.getInfo())}")
+	except KeyboardInterrupt:
+		pass
+	server.stop()
+	print(json.dumps(server.getInfo(), indent=2))
+
+# ///////////////////////////////////////////////////////////////////
+if __name__=="__main__":
+	_Main(sys.argv[1:])
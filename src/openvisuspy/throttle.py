@@ -0,0 +1,107 @@
+import os,time,logging
+
+from .utils import Clamp
+
+logger = logging.getLogger(__name__)
+
+# ///////////////////////////////////////////////////////////////////
+class AdaptiveThrottle:
+	"""
+	Chooses the minimum interval between two jobs pushed by a Slice and the polling period of `Slice.onIdle`,
+	from the measured query latency (push -> first result), render latency (gotNewData) and interaction rate (refresh calls).
+
+	 - push interval: there is no point pushing jobs faster than the dataset can return a first refinement,
+	   they would be aborted before showing anything (fast local datasets get a short interval, slow remote ones a long one)
+	 - polling: fast while a job is running or the user is interacting (but leaving the event loop at least half free
+	   considering the render time), slow when the session is idle
+	"""
+
+	# constructor
+	def __init__(self,
+		min_push_sec=None, max_push_sec=None,
+		min_poll_msec=None, max_poll_msec=None,
+		idle_sec=2.0, alpha=0.3):
+
+		self.min_push_sec =float(os.environ.get("VISUS_SLICE_PUSH_SEC_MIN",0.02))  if min_push_sec  is None else min_push_sec
+		self.max_push_sec =float(os.environ.get("VISUS_SLICE_PUSH_SEC_MAX",1.0))   if max_push_sec  is None else max_push_sec
+		self.min_poll_msec=int  (os.environ.get("VISUS_SLICE_POLL_MSEC_MIN",10))   if min_poll_msec is None else min_poll_msec
+		self.max_poll_msec=int  (os.environ.get("VISUS_SLICE_POLL_MSEC_MAX",100))  if max_poll_msec is None else max_poll_msec
+		self.idle_sec=idle_sec
+		self.alpha=alpha
+
+		# measures (exponentially weighted moving averages)
+		self.first_result_sec=None
+		self.render_sec=None
+		self.interaction_rate=0.0
+
+		self.last_interaction=0.0
+		self.t_push=None
+		self.running=False
+		self.got_first_result=False
+
+		# chosen values (i.e. the old hard-coded ones until there is something measured)
+		self.push_sec=Clamp(0.2, self.min_push_sec, self.max_push_sec)
+		self.poll_msec=Clamp(1000//30, self.min_poll_msec, self.max_poll_msec)
+
+	# ewma
+	def ewma(self, old, new):
+		return new if old is None else (1.0-self.alpha)*old + self.alpha*new
+
+	# onInteraction (i.e. Slice.refresh)
+	def onInteraction(self):
+		now=time.time()
+		dt=now-self.last_interaction
+		self.interaction_rate=self.ewma(self.interaction_rate, 1.0/dt if dt>0 else 0.0) if dt<self.idle_sec else 0.0
+		self.last_interaction=now
+
+	# onPush
+	def onPush(self):
+		now=time.time()
+		# the previous job was aborted before its first result, its latency was at least this
+		if self.running and not self.got_first_result and self.t_push is not None:
+			self.first_result_sec=self.ewma(self.first_result_sec, max(now-self.t_push, self.first_result_sec or 0.0))
+		self.t_push=now
+		self.running=True
+		self.got_first_result=False
+		self.update()
+
+	# onResult
+	def onResult(self, running, render_sec):
+		if not self.got_first_result and self.t_push is not None:
+			self.first_result_sec=self.ewma(self.first_result_sec, time.time()-self.t_push)
+			self.got_first_result=True
+		self.render_sec=self.ewma(self.render_sec, render_sec)
+		if not running:
+			self.running=False
+		self.update()
+
+	# canPush
+	def canPush(self, last_job_pushed):
+		return (time.time()-last_job_pushed)>=self.push_sec
+
+	# isBusy
+	def isBusy(self):
+		return self.running or (time.time()-self.last_interaction)<self.idle_sec
+
+	# update
+	def update(self):
+		if self.first_result_sec is not None:
+			self.push_sec=Clamp(self.first_result_sec, self.min_push_sec, self.max_push_sec)
+		if self.isBusy():
+			render_msec=1000.0*(self.render_sec or 0.0)
+			self.poll_msec=int(Clamp(2.0*render_msec, self.min_poll_msec, self.max_poll_msec))
+		else:
+			self.poll_msec=self.max_poll_msec
+		return self.poll_msec
+
+	# getInfo
+	def getInfo(self):
+		def Msec(value): return "-" if value is None else f"{1000*value:.0f}"
+		return " ".join([
+			f"push={1000*self.push_sec:.0f}ms",
+			f"poll={self.poll_msec}ms",
+			f"first-result={Msec(self.first_result_sec)}ms",
+			f"render={Msec(self.render_sec)}ms",
+			f"interactions={self.interaction_rate:.1f}/s",
+			"busy" if self.isBusy() else "idle"
+		])
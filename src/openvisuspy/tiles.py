@@ -0,0 +1,281 @@
+import os,time,logging,threading,itertools,collections,traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .backend import LoadDataset,ExecuteBoxQuery,Aborted
+from .retry   import GetRetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# samples per side of a tile, at the resolution of the tile
+DEFAULT_TILE_SIZE=int(os.environ.get("VISUS_TILE_SIZE",256))
+
+# ///////////////////////////////////////////////////////////////////
+class TileCache:
+	"""
+	LRU of fetched tiles, bounded by the total size of the data (shared by all sessions of the process)
+	"""
+
+	# constructor
+	def __init__(self, max_bytes):
+		self.max_bytes=max_bytes
+		self.lock=threading.Lock()
+		self.tiles=collections.OrderedDict()
+		self.nbytes=0
+		self.num_hits=0
+		self.num_misses=0
+
+	# get
+	def get(self, key):
+		with self.lock:
+			value=self.tiles.get(key)
+			if value is None:
+				self.num_misses+=1
+				return None
+			self.tiles.move_to_end(key)
+			self.num_hits+=1
+			return value
+
+	# put
+	def put(self, key, value):
+		nbytes=value["data"].nbytes
+		if nbytes>self.max_bytes:
+			return
+		with self.lock:
+			old=self.tiles.pop(key,None)
+			if old is not None:
+				self.nbytes-=old["data"].nbytes
+			self.tiles[key]=value
+			self.nbytes+=nbytes
+			while self.nbytes>self.max_bytes:
+				__,old=self.tiles.popitem(last=False)
+				self.nbytes-=old["data"].nbytes
+
+	# clear
+	def clear(self):
+		with self.lock:
+			self.tiles.clear()
+			self.nbytes=0
+
+	# getInfo
+	def getInfo(self):
+		with self.lock:
+			return {"num_tiles": len(self.tiles), "nbytes": self.nbytes, "max_bytes": self.max_bytes, "hits": self.num_hits, "misses": self.num_misses}
+
+
+# ///////////////////////////////////////////////////////////////////
+class TileFetcher:
+	"""
+	Fetches tiles (or any box at a given resolution, see ConcurrentRefinementsDataset) in parallel. Each read has its own dataset object, since dataset objects keep
+	per-query state. It is closed after the read, so that the DatasetPool can expire the url (the heavy part is shared, see DatasetPool)
+	"""
+
+	# constructor
+	def __init__(self, num_workers, thread_name_prefix="tiles"):
+		self.num_workers=num_workers
+		self.executor=ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix=thread_name_prefix)
+
+	# submit
+	def submit(self, url, timestep, field, tile, h, aborted):
+		return self.executor.submit(self.fetchTile, url, timestep, field, tile, h, aborted)
+
+	# fetchTile (worker thread)
+	def fetchTile(self, url, timestep, field, tile, h, aborted):
+		if aborted.isTrue():
+			return None
+		t1=time.time()
+
+		# NOTE: the read can run on a hedging thread, so the dataset object is taken inside
+		def ReadTile():
+			db=LoadDataset(url)
+			try:
+				result=None
+				for result in ExecuteBoxQuery(db, timestep=timestep, field=field, logic_box=tile, endh=h, num_refinements=1, aborted=aborted):
+					pass
+			finally:
+				db.close()
+			if result is None and not aborted.isTrue():
+				raise Exception("read failed")
+			return result
+
+		try:
+			result=GetRetryPolicy(url).call(ReadTile, cancelled=aborted.isTrue)
+		except:
+			if not aborted.isTrue():
+				logger.error(f"fetchTile tile={tile} h={h} failed {traceback.format_exc()}")
+			return None
+		# an aborted query can return partial data, never cache it
+		if result is None or aborted.isTrue():
+			return None
+		return {"logic_box": result["logic_box"], "data": result["data"], "sec": time.time()-t1}
+
+
+# ///////////////////////////////////////////////////////////////////
+_tile_cache=TileCache(int(os.environ.get("VISUS_TILE_CACHE_MB",256))*1024*1024)
+_tile_fetcher=None
+_tile_fetcher_lock=threading.Lock()
+
+def GetTileCache():
+	return _tile_cache
+
+def GetTileFetcher():
+	global _tile_fetcher
+	with _tile_fetcher_lock:
+		if _tile_fetcher is None:
+			_tile_fetcher=TileFetcher(int(os.environ.get("VISUS_TILE_NUM_WORKERS",4)))
+		return _tile_fetcher
+
+
+# ///////////////////////////////////////////////////////////////////
+def GetTiles(db, logic_box, h, slice_dir=None, tile_size=DEFAULT_TILE_SIZE):
+	"""
+	Fixed tiles covering `logic_box` at resolution `h`: each one is `tile_size` samples per side, starting at a multiple of its size
+	(so it is aligned to the bitmask and does not depend on the viewport). Returns the tiles closest to the center first
+	"""
+	pdim=db.getPointDim()
+	dims=[int(it) for it in db.getLogicSize()]
+	__,delta,__=db.getAlignedBox(logic_box, h, slice_dir=slice_dir)
+	p1,p2=logic_box
+
+	ranges=[]
+	for I in range(pdim):
+		if I==slice_dir:
+			ranges.append([(p1[I],p1[I]+1)])
+		else:
+			E=tile_size*delta[I]
+			ranges.append([(A,min(A+E,dims[I])) for A in range(E*(p1[I]//E), min(p2[I],dims[I]), E)])
+
+	center=[0.5*(p1[I]+p2[I]) for I in range(pdim)]
+	def Distance(tile):
+		return sum((0.5*(tile[0][I]+tile[1][I])-center[I])**2 for I in range(pdim) if I!=slice_dir)
+
+	tiles=[([a for a,b in it],[b for a,b in it]) for it in itertools.product(*ranges)]
+	return sorted(tiles, key=Distance)
+
+
+# ///////////////////////////////////////////////////////////////////
+class TiledQuery:
+
+	# constructor
+	def __init__(self, timestep, field, logic_box, slice_dir, end_resolutions, aborted):
+		self.timestep=timestep
+		self.field=field
+		self.logic_box=logic_box
+		self.slice_dir=slice_dir
+		self.end_resolutions=end_resolutions
+		self.aborted=aborted
+		self.cursor=0
+		self.t1=time.time()
+
+
+# ///////////////////////////////////////////////////////////////////
+class TiledDataset:
+	"""
+	Same query interface as the dataset (createBoxQuery/beginBoxQuery/isQueryRunning/executeBoxQuery/nextBoxQuery), but each refinement
+	is stitched from fixed tiles (see GetTiles) fetched in parallel and cached, so that panning only fetches the newly exposed tiles.
+	Only for 2D datasets and slices of 3D datasets
+	"""
+
+	# constructor
+	def __init__(self, db, tile_size=DEFAULT_TILE_SIZE, cache=None, fetcher=None):
+		self.db=db
+		self.tile_size=tile_size
+		self.cache=cache or GetTileCache()
+		self.fetcher=fetcher or GetTileFetcher()
+
+	# __getattr__ (everything else is the dataset)
+	def __getattr__(self, name):
+		return getattr(self.db, name)
+
+	# createBoxQuery
+	def createBoxQuery(self, timestep=None, field=None, logic_box=None, max_pixels=None, endh=None, num_refinements=1, aborted=None, full_dim=False):
+		ret=self.db.guessEndResolutions(logic_box, max_pixels=max_pixels, endh=endh, num_refinements=num_refinements, full_dim=full_dim)
+		if ret is None:
+			return None
+		logic_box,slice_dir,end_resolutions=ret
+		assert self.db.getPointDim()==2 or slice_dir is not None, "tiles need 2D data or a slice"
+		return TiledQuery(
+			self.db.getTimestep() if timestep is None else timestep,
+			self.db.getField() if field is None else field,
+			logic_box, slice_dir, end_resolutions,
+			Aborted() if aborted is None else aborted)
+
+	# beginBoxQuery
+	def beginBoxQuery(self, query):
+		if query is None: return
+		logger.info(f"beginBoxQuery (tiled) timestep={query.timestep} field={query.field} logic_box={query.logic_box} end_resolutions={query.end_resolutions}")
+		query.cursor=0
+
+	# isQueryRunning
+	def isQueryRunning(self, query):
+		return query is not None and query.cursor<len(query.end_resolutions) and not query.aborted.isTrue()
+
+	# getCurrentResolution
+	def getCurrentResolution(self, query):
+		return query.end_resolutions[query.cursor] if self.isQueryRunning(query) else -1
+
+	# nextBoxQuery
+	def nextBoxQuery(self, query):
+		if not self.isQueryRunning(query): return
+		query.cursor+=1
+
+	# executeBoxQuery (the access is not used, each fetcher thread has its own)
+	def executeBoxQuery(self, access, query, spans=None):
+		assert self.isQueryRunning(query)
+		t1=time.perf_counter()
+		url=self.db.getUrl()
+		h=query.end_resolutions[query.cursor]
+		box,delta,num_pixels=self.db.getAlignedBox(query.logic_box, h, slice_dir=query.slice_dir)
+
+		# cached tiles first, then the missing ones (center first)
+		tiles,pending={},{}
+		for tile in GetTiles(self.db, box, h, slice_dir=query.slice_dir, tile_size=self.tile_size):
+			key=(url, query.field, query.timestep, h, tuple(tile[0]), tuple(tile[1]))
+			value=self.cache.get(key)
+			if value is not None:
+				tiles[key]=value
+			else:
+				pending[key]=self.fetcher.submit(url, query.timestep, query.field, tile, h, query.aborted)
+		num_hits=len(tiles)
+
+		nbytes_read=0
+		for key,future in pending.items():
+			value=future.result()
+			if value is None:
+				for it in pending.values(): it.cancel()
+				return None
+			self.cache.put(key, value)
+			tiles[key]=value
+			nbytes_read+=value["data"].nbytes
+
+		# stitch (the data of a slice is (Y,X) where X,Y are the two directions other than the slice one)
+		X,Y=[I for I in range(self.db.getPointDim()) if I!=query.slice_dir]
+		W,H=num_pixels[X],num_pixels[Y]
+		first=next(iter(tiles.values()))["data"]
+		data=np.zeros((H,W)+first.shape[2:], dtype=first.dtype)
+		for value in tiles.values():
+			p1=value["logic_box"][0]
+			tile=value["data"]
+			x0,y0=(p1[X]-box[0][X])//delta[X], (p1[Y]-box[0][Y])//delta[Y]
+			xa,ya=max(x0,0),max(y0,0)
+			xb,yb=min(x0+tile.shape[1],W),min(y0+tile.shape[0],H)
+			if xa<xb and ya<yb:
+				data[ya:yb,xa:xb]=tile[ya-y0:yb-y0,xa-x0:xb-x0]
+
+		if spans is not None:
+			spans.add("tiles", t1, I=query.cursor, hits=num_hits, fetched=len(pending))
+
+		msec=int(1000*(time.time()-query.t1))
+		logger.info(f"got tiled data cursor={query.cursor} H={h} data.shape={data.shape} logic_box={box} tiles={len(tiles)} hits={num_hits} ms={msec}")
+		return {
+			"I": query.cursor,
+			"timestep": query.timestep,
+			"field": query.field,
+			"logic_box": [[int(it) for it in box[0]],[int(it) for it in box[1]]],
+			"H": h,
+			"data": data,
+			"msec": msec,
+			"tiles": f"tiles={len(tiles)} hit={num_hits}",
+			"nbytes_read": nbytes_read,
+		}
@@ -0,0 +1,295 @@
+import os,sys,time,json,logging,argparse,platform
+
+logger = logging.getLogger(__name__)
+
+TRACE_VERSION=1
+
+# state changes closer than this (and with no query/render in between) are one user interaction
+DEFAULT_COALESCE_SEC=0.05
+
+# ///////////////////////////////////////////////////////////////////
+def GetOpenVisuspyVersion():
+	try:
+		from importlib.metadata import version
+		return version("openvisuspy")
+	except Exception:
+		return None
+
+# ///////////////////////////////////////////////////////////////////
+class TraceRecorder:
+	"""
+	Timestamped trace of a Slice session: every state change reaching `Slice.refresh()`, the pushed queries and the rendered results.
+	With a `filename` events are appended to it as JSON lines (so a crashed session still leaves a trace), otherwise they are kept in memory
+	"""
+
+	# constructor
+	def __init__(self, filename=None):
+		self.filename=filename
+		self.t0=time.perf_counter()
+		self.events=[]
+		self.last_state=None
+		self.last_render=None
+		self.paused=False
+		self.file=None
+		if filename:
+			os.makedirs(os.path.dirname(os.path.abspath(filename)),exist_ok=True)
+			self.file=open(filename,"w",buffering=1)
+		self.record("header",
+			version=TRACE_VERSION,
+			created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+			python=platform.python_version(),
+			platform=platform.platform(),
+			openvisuspy=GetOpenVisuspyVersion())
+
+	# getTime (seconds since the beginning of the trace)
+	def getTime(self):
+		return time.perf_counter()-self.t0
+
+	# record
+	def record(self, type, **kwargs):
+		event={"type":type, "t":self.getTime(), **kwargs}
+		if type=="render":
+			self.last_render=event
+		if self.file:
+			self.file.write(json.dumps(event, default=str)+"\n")
+		else:
+			self.events.append(event)
+		return event
+
+	# recordState (skipping the refresh() calls that do not change anything)
+	def recordState(self, state, force=False):
+		if self.paused or (state==self.last_state and not force):
+			return None
+		self.last_state=state
+		return self.record("state", state=state)
+
+	# getEvents
+	def getEvents(self):
+		return LoadTrace(self.filename) if self.filename else list(self.events)
+
+	# close
+	def close(self):
+		if self.file:
+			self.file.close()
+			self.file=None
+			# from now on getEvents reads the file
+			self.events=None
+
+
+# ///////////////////////////////////////////////////////////////////
+def LoadTrace(filename):
+	with open(filename,"r") as f:
+		return [json.loads(line) for line in f if line.strip()]
+
+# ///////////////////////////////////////////////////////////////////
+def SaveTrace(events, filename):
+	with open(filename,"w") as f:
+		for event in events:
+			f.write(json.dumps(event, default=str)+"\n")
+
+# ///////////////////////////////////////////////////////////////////
+def CoalesceStates(events, coalesce_sec=DEFAULT_COALESCE_SEC):
+	"""
+	one widget change can reach refresh() several times with intermediate states (e.g. direction -> offset -> viewport).
+	Keep only the last state of each burst
+	"""
+	ret=[]
+	for event in events:
+		if event["type"]=="state" and ret and ret[-1]["type"]=="state" and (event["t"]-ret[-1]["t"])<coalesce_sec:
+			ret[-1]=event
+		else:
+			ret.append(event)
+	return ret
+
+# ///////////////////////////////////////////////////////////////////
+def AnalyzeTrace(events, coalesce_sec=DEFAULT_COALESCE_SEC):
+	"""
+	returns one step per (coalesced) state change with the latencies of the query/renders that followed it
+	"""
+	steps=[]
+	step,last_state=None,{}
+	for event in CoalesceStates(events, coalesce_sec):
+		type=event["type"]
+		if type=="state":
+			state=event["state"]
+			step={
+				"step": len(steps),
+				"t": event["t"],
+				"changed": sorted(k for k in state if state.get(k)!=last_state.get(k)),
+				"state": state,
+				"push_sec": None,
+				"first_render_sec": None,
+				"final_render_sec": None,
+				"num_renders": 0,
+				"H": None,
+				"query_msec": None,
+				"render_msec": 0,
+			}
+			steps.append(step)
+			last_state=state
+		elif step is None:
+			continue
+		elif type=="query":
+			if step["push_sec"] is None:
+				step["push_sec"]=event["t"]-step["t"]
+		elif type=="render":
+			step["num_renders"]+=1
+			if step["first_render_sec"] is None:
+				step["first_render_sec"]=event["t"]-step["t"]
+			if not event["running"]:
+				step["final_render_sec"]=event["t"]-step["t"]
+			step["H"]=event["H"]
+			step["query_msec"]=event["query_msec"]
+			step["render_msec"]+=event["render_msec"]
+	return steps
+
+# ///////////////////////////////////////////////////////////////////
+class TraceReplayer:
+	"""
+	Drives a headless Slice through a recorded trace.
+	speed=1.0 replays at the original pace (later steps can abort running queries, as they did originally),
+	speed=N is N times faster, speed=0 applies each step as soon as the previous one has been fully rendered
+	"""
+
+	# constructor
+	def __init__(self, events, width=None, height=None, speed=1.0, timeout=60.0, output=None, coalesce_sec=DEFAULT_COALESCE_SEC):
+		from .slice import Slice
+		self.events=CoalesceStates(events, coalesce_sec)
+		self.speed=speed
+		self.timeout=timeout
+		self.slice=Slice()
+
+		# use the size of the original canvas
+		if width is None or height is None:
+			sizes=[it["state"].get("canvas") for it in self.events if it["type"]=="state" and it["state"].get("canvas")]
+			width,height=sizes[0] if sizes else (1024,768)
+		self.slice.canvas.setFixedSize(width, height)
+		self.trace=self.slice.startTrace(output)
+
+	# isIdle (last result of the last job rendered)
+	def isIdle(self):
+		last_render=self.trace.last_render
+		return not self.slice.new_job and last_render is not None and not last_render["running"]
+
+	# driveUntil
+	def driveUntil(self, condition, timeout):
+		T1=time.perf_counter()
+		while not condition() and (time.perf_counter()-T1)<timeout:
+			self.slice.onIdle()
+			time.sleep(0.001)
+		return condition()
+
+	# run
+	def run(self):
+		T0=time.perf_counter()
+		num_timeouts=0
+		for event in self.events:
+			type=event["type"]
+
+			# the states following the load are part of the trace, do not record them twice
+			if type=="load":
+				self.trace.paused=True
+				try:
+					self.slice.load(event["value"])
+				finally:
+					self.trace.paused=False
+
+			elif type=="state":
+				if self.speed>0:
+					self.driveUntil(lambda: (time.perf_counter()-T0)>=event["t"]/self.speed, timeout=float("inf"))
+				elif not self.driveUntil(self.isIdle, self.timeout):
+					num_timeouts+=1
+				self.trace.last_render=None
+				self.trace.paused=True
+				try:
+					self.slice.setTraceState(event["state"])
+				finally:
+					self.trace.paused=False
+				self.trace.recordState(self.slice.getTraceState(), force=True)
+				self.slice.refresh()
+
+		# last step
+		if not self.driveUntil(self.isIdle, self.timeout):
+			num_timeouts+=1
+
+		self.slice.stop()
+		self.slice.stopTrace()
+		if num_timeouts:
+			logger.info(f"Replay had {num_timeouts} step(s) not finished within timeout={self.timeout}")
+		return self.trace.getEvents()
+
+
+# ///////////////////////////////////////////////////////////////////
+def ReplayTrace(events, speed=1.0, width=None, height=None, timeout=60.0, output=None):
+	return TraceReplayer(events, width=width, height=height, speed=speed, timeout=timeout, output=output).run()
+
+# ///////////////////////////////////////////////////////////////////
+def DiffTraces(a, b, coalesce_sec=DEFAULT_COALESCE_SEC):
+	"""
+	step-by-step timing comparison of two traces of the same interactions (e.g. two versions/configurations replaying the same trace)
+	"""
+	steps_a,steps_b=AnalyzeTrace(a, coalesce_sec),AnalyzeTrace(b, coalesce_sec)
+	if len(steps_a)!=len(steps_b):
+		logger.info(f"Traces have a different number of steps {len(steps_a)}!={len(steps_b)}, comparing the first {min(len(steps_a),len(steps_b))}")
+	ret=[]
+	for A,B in zip(steps_a,steps_b):
+		item={"step":A["step"], "changed":A["changed"]}
+		for key in ["push_sec","first_render_sec","final_render_sec","query_msec","render_msec","H","num_renders"]:
+			va,vb=A[key],B[key]
+			item[key]=[va,vb]
+			if key.endswith(("_sec","_msec")) and va and vb is not None:
+				item[key].append(vb/va)
+		ret.append(item)
+	return ret
+
+
+# ///////////////////////////////////////////////////////////////////
+def _FormatSec(value):
+	return "-" if value is None else f"{1000*value:.0f}"
+
+# ///////////////////////////////////////////////////////////////////
+def _Main(args):
+
+	parser = argparse.ArgumentParser(prog="python -m openvisuspy.trace", description="Slice interaction traces: summary, replay and diff")
+	sub=parser.add_subparsers(dest="command", required=True)
+
+	p=sub.add_parser("summary", help="per-step timings of a trace")
+	p.add_argument("trace")
+
+	p=sub.add_parser("replay", help="replay a trace on a headless Slice, the output is a new trace")
+	p.add_argument("trace")
+	p.add_argument("--speed", type=float, default=1.0, help="1.0 original pace, N times faster, 0 for as-fast-as-possible (each step waits for the final refinement)")
+	p.add_argument("--width", type=int, default=None)
+	p.add_argument("--height", type=int, default=None)
+	p.add_argument("--timeout", type=float, default=60.0)
+	p.add_argument("--output", required=True)
+
+	p=sub.add_parser("diff", help="per-step timing diff of two traces")
+	p.add_argument("a")
+	p.add_argument("b")
+	p.add_argument("--threshold", type=float, default=0.0, help="only show steps where final render ratio differs from 1.0 by more than this")
+
+	args=parser.parse_args(args)
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+	if args.command=="summary":
+		print(f"{'step':>5} {'push ms':>8} {'first ms':>8} {'final ms':>8} {'#':>3} {'H':>4}  changed")
+		for it in AnalyzeTrace(LoadTrace(args.trace)):
+			print(f"{it['step']:>5} {_FormatSec(it['push_sec']):>8} {_FormatSec(it['first_render_sec']):>8} {_FormatSec(it['final_render_sec']):>8} {it['num_renders']:>3} {str(it['H']):>4}  {','.join(it['changed'])}")
+
+	elif args.command=="replay":
+		events=ReplayTrace(LoadTrace(args.trace), speed=args.speed, width=args.width, height=args.height, timeout=args.timeout, output=args.output)
+		logger.info(f"Replay done num_events={len(events)} output={args.output}")
+
+	elif args.command=="diff":
+		print(f"{'step':>5} {'first a ms':>10} {'first b ms':>10} {'final a ms':>10} {'final b ms':>10} {'ratio':>6}  changed")
+		for it in DiffTraces(LoadTrace(args.a), LoadTrace(args.b)):
+			first,final=it["first_render_sec"],it["final_render_sec"]
+			ratio=final[2] if len(final)>2 else None
+			if args.threshold and (ratio is None or abs(ratio-1.0)<=args.threshold):
+				continue
+			print(f"{it['step']:>5} {_FormatSec(first[0]):>10} {_FormatSec(first[1]):>10} {_FormatSec(final[0]):>10} {_FormatSec(final[1]):>10} {'-' if ratio is None else f'{ratio:.2f}':>6}  {','.join(it['changed'])}")
+
+# ///////////////////////////////////////////////////////////////////
+if __name__=="__main__":
+	_Main(sys.argv[1:])
@@ -0,0 +1,144 @@
+import os,copy,time,json,logging,threading,traceback
+from concurrent.futures import ThreadPoolExecutor,wait
+
+from .utils   import LoadJSON
+from .backend import LoadDataset,ExecuteBoxQuery
+from .render  import GetLogicToPhysic,GetFrameLogicBox
+
+logger = logging.getLogger(__name__)
+
+# ///////////////////////////////////////////////////////////////////
+class WarmUp:
+	"""
+	Server warm-up: parses the dashboards config once, opens the dataset of every scene (kept open for the life of the server, see DatasetPool)
+	and reads the coarsest `num_levels` refinements of its default view and timestep, so that they are in the caches before the first session
+	(the OpenVisus cache for `cached=` urls, the tile cache with VISUS_SLICE_TILED)
+	"""
+
+	# constructor
+	def __init__(self, config, num_levels=None, width=None, height=None, num_workers=None, tiled=None):
+		self.source=config
+		# same as Slice.load, anything but a .json is a dataset url
+		if isinstance(config,str) and os.path.splitext(config)[1].split("?")[0]!=".json":
+			config={"scenes": [{"name": os.path.basename(config), "url": config}]}
+		self.config=LoadJSON(config)
+		self.num_levels =int(os.environ.get("VISUS_WARMUP_NUM_LEVELS",3))   if num_levels  is None else num_levels
+		self.width      =int(os.environ.get("VISUS_WARMUP_WIDTH",1024))     if width       is None else width
+		self.height     =int(os.environ.get("VISUS_WARMUP_HEIGHT",768))     if height      is None else height
+		self.num_workers=int(os.environ.get("VISUS_WARMUP_NUM_WORKERS",4))  if num_workers is None else num_workers
+		self.tiled      =bool(int(os.environ.get("VISUS_SLICE_TILED",0)))   if tiled       is None else tiled
+		self.lock=threading.Lock()
+		self.datasets={}
+		self.scenes={}
+		self.sec=None
+
+	# getConfig (a copy for a session, see Slice.load)
+	def getConfig(self):
+		return copy.deepcopy(self.config)
+
+	# getScenes (same as Slice.load, the root key can be anything)
+	def getScenes(self):
+		root=list(self.config.keys())[0]
+		return [it for it in self.config[root] if "name" in it and "url" in it]
+
+	# run (returns after `timeout` sec even if some scenes are not warm yet, they keep going in background)
+	def run(self, timeout=None):
+		T1=time.time()
+		scenes=self.getScenes()
+		executor=ThreadPoolExecutor(max_workers=max(1,self.num_workers), thread_name_prefix="warmup")
+		done,not_done=wait([executor.submit(self.warmScene, scene) for scene in scenes], timeout=timeout)
+		executor.shutdown(wait=False)
+		self.sec=time.time()-T1
+		logger.info(f"WarmUp sec={self.sec:.2f} num_scenes={len(scenes)} pending={len(not_done)} {json.dumps(self.getInfo())}")
+		return self.getInfo()
+
+	# getDataset
+	def getDataset(self, url):
+		with self.lock:
+			db=self.datasets.get(url,None)
+		if db is not None:
+			return db
+		db=LoadDataset(url)
+		with self.lock:
+			other=self.datasets.setdefault(url,db)
+		if other is not db:
+			db.close()
+		return other
+
+	# warmScene (worker thread)
+	def warmScene(self, scene):
+		name,url=scene["name"],scene["url"]
+		t1=time.time()
+		item={"url": url}
+		try:
+			db=self.getDataset(url)
+			item["open_sec"]=time.time()-t1
+
+			# default view and timestep (see Slice.setSceneBody)
+			pdim=db.getPointDim()
+			timestep=int(scene.get("timestep", db.getTimesteps()[0]))
+			field=scene.get("field", db.getField())
+			direction=int(scene.get("direction",2))
+			logic_to_physic=GetLogicToPhysic(db, scene)
+			if "offset" in scene:
+				offset=float(scene["offset"])
+			else:
+				vt,vs=logic_to_physic[direction] if pdim==3 else (0.0,1.0)
+				offset=vt+vs*(int(db.getLogicSize()[direction])//2) if pdim==3 else 0.0
+			logic_box=GetFrameLogicBox(db, logic_to_physic, direction, offset, viewport=scene.get("viewport",None))
+
+			# view dependent: the canvas size is the pixel budget, otherwise the fixed resolution of the scene
+			kwargs={}
+			if bool(scene.get("view-dependent",True)):
+				kwargs["max_pixels"]=self.width if pdim==1 else self.width*self.height
+			else:
+				endh=int(scene.get("resolution",-6))
+				kwargs["endh"]=db.getMaxResolution()+endh if endh<0 else endh
+
+			levels,nbytes=[],0
+			tiled=self.tiled and pdim>=2 and hasattr(db,"guessEndResolutions")
+			for result in ExecuteBoxQuery(db, timestep=timestep, field=field, logic_box=logic_box, num_refinements=self.num_levels, tiled=tiled, **kwargs):
+				levels.append(int(result["H"]))
+				nbytes+=result["data"].nbytes
+			item.update(timestep=timestep, field=field, levels=levels, nbytes=nbytes)
+		except Exception as ex:
+			logger.error(f"WarmUp scene={name} url={url} failed {traceback.format_exc()}")
+			item["error"]=str(ex)
+		item["sec"]=time.time()-t1
+		with self.lock:
+			self.scenes[name]=item
+		logger.info(f"WarmUp scene={name} {json.dumps(item)}")
+
+	# close (give back the datasets)
+	def close(self):
+		with self.lock:
+			datasets,self.datasets=self.datasets,{}
+		for db in datasets.values():
+			db.close()
+
+	# getInfo
+	def getInfo(self):
+		with self.lock:
+			return {"sec": self.sec, "scenes": copy.deepcopy(self.scenes)}
+
+
+# ///////////////////////////////////////////////////////////////////
+_warmup=None
+
+def GetWarmUp():
+	return _warmup
+
+# StartWarmUp (once per process, see dashboards/app_hooks.py)
+def StartWarmUp(config, timeout=None):
+	global _warmup
+	if _warmup is None:
+		_warmup=WarmUp(config)
+		_warmup.run(timeout=timeout)
+	return _warmup
+
+# StopWarmUp
+def StopWarmUp():
+	global _warmup
+	if _warmup is not None:
+		_warmup.close()
+		_warmup=None
@@ -4,20 +4,112 @@ import pandas as pd
 import concurrent.futures
 
 import os
+import time
+import json
+import hashlib
+import threading
+import requests
 
 # !pip install OpenVisusNoGui
 import OpenVisus as ov
 
+from .retry import GetRetryPolicy
+
 # see https://xarray.pydata.org/en/stable/internals/how-to-add-new-backend.html
 
 
+# ////////////////////////////////////////////////////////////
+class TimeReadAhead:
+    """
+    Prefetch the next timesteps of the same spatial box when the caller is iterating over time
+    (i.e. `for t in range(n): ds.field.isel(time=t).values`).
+    The window is bounded both by `num_steps` and by `max_bytes`, and it is cancelled as soon as the access pattern breaks.
+    """
+
+    # constructor
+    def __init__(self, fetch, num_steps=4, max_bytes=256*1024*1024, max_workers=4):
+        self.fetch=fetch
+        self.num_steps=num_steps
+        self.max_bytes=max_bytes
+        self.max_workers=max_workers
+        self.executor=None
+        self.lock=threading.Lock()
+        self.pending={} # (time,res,logic_box,field) -> future
+        self.last=None
+        self.delta=None
+
+    # isSequential
+    def isSequential(self, time, other):
+        if self.last is None or self.last[1:]!=other:
+            return False
+        delta=time-self.last[0]
+        return delta!=0 and (delta==self.delta or abs(delta)==1)
+
+    # cancel
+    def cancel(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending={}
+
+    # read
+    def read(self, time, res, logic_box, field, nbytes, num_timesteps):
+
+        # tuples so they can be used as keys
+        logic_box=tuple(tuple(it) for it in logic_box)
+        key=(time, res, logic_box, field)
+
+        with self.lock:
+
+            if self.isSequential(time, key[1:]):
+                self.delta=time-self.last[0]
+            else:
+                self.cancel()
+                self.delta=None
+            self.last=key
+            future=self.pending.pop(key, None)
+
+            # schedule the next timesteps (if the pattern is sequential)
+            if self.delta is not None and self.num_steps>0:
+                num_steps=min(self.num_steps, self.max_bytes//max(nbytes,1))
+                wanted=[time+self.delta*I for I in range(1,num_steps+1)]
+                wanted=[it for it in wanted if 0<=it<num_timesteps]
+
+                # drop what is not in the window anymore
+                for it in [it for it in self.pending if it[0] not in wanted]:
+                    self.pending.pop(it).cancel()
+
+                if self.executor is None:
+                    self.executor=concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+
+                for it in wanted:
+                    prefetch_key=(it,)+key[1:]
+                    if prefetch_key not in self.pending:
+                        self.pending[prefetch_key]=self.executor.submit(self.fetch, it, res, logic_box, field)
+
+        if future is not None and not future.cancelled():
+            try:
+                return future.result()
+            except Exception as e:
+                print(f"Prefetch of time={time} failed ({e}), reading again")
+
+        return self.fetch(time, res, logic_box, field)
+
+    # close
+    def close(self):
+        with self.lock:
+            self.cancel()
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor=None
+
+
 # ////////////////////////////////////////////////////////////
 class OpenVisusBackendArray(xr.backends.common.BackendArray):
 #     TODO: add num_refinements,quality
 #     TODO: adding it for normalized coordinates
 
     # constructor
-    def __init__(self,db, shape, dtype, timesteps,resolution,fieldname):
+    def __init__(self,db, shape, dtype, timesteps,resolution,fieldname, readahead=4, readahead_max_bytes=256*1024*1024):
         self.db    = db
         self.shape = shape
         self.fieldname=fieldname
@@ -27,6 +119,22 @@ class OpenVisusBackendArray(xr.backends.common.BackendArray):
         self.resolution=resolution
         self.resFound=True
         self.timeFound=True
+        self.readahead=TimeReadAhead(self._fetchTimestep, num_steps=readahead, max_bytes=readahead_max_bytes)
+        self.retry_policy=GetRetryPolicy(getattr(db,"url",None))
+
+    # _fetchTimestep
+    def _fetchTimestep(self, time, res, logic_box, field):
+        return self.retry_policy.call(self.db.read, time=time, max_resolution=res, logic_box=[list(it) for it in logic_box], field=field)
+
+    # _readTimestep (read a single timestep, prefetching the next ones in case of sequential access)
+    def _readTimestep(self, time, res, logic_box, field):
+        p1,p2=logic_box
+        nbytes=int(np.prod([B-A for A,B in zip(p1,p2)]))*np.dtype(self.dtype).itemsize
+        return self.readahead.read(time, res, logic_box, field, nbytes=nbytes, num_timesteps=int(self.shape[0]))
+
+    # close
+    def close(self):
+        self.readahead.close()
 
     # _getKeyRange
     def _getXRange(self, value):
@@ -75,26 +183,18 @@ class OpenVisusBackendArray(xr.backends.common.BackendArray):
 
     def _raw_indexing_method(self, key: tuple) -> np.typing.ArrayLike:
 
-        def fetch_data( time, res, x1, y1, x2, y2, fieldname, max_attempts=5, retry_delay=5):
-            attempt = 1
-            while attempt < max_attempts:
-                try:
-                    # if attempt>0:
-                    #     print(f'Attempt: {attempt} out of {max_attempts}')
-                    d=self.db.read(time=time, max_resolution=res, logic_box=[(x1, y1), (x2, y2)], field=fieldname)
-                    return d
-                except Exception as e:  # Consider specifying the exception type if possible
-                    # print(f"Retry {attempt + 1}/{max_attempts} - Error fetching data: {e}")
-                    attempt += 1
-                    time.sleep(retry_delay)
-                    if attempt == max_attempts:
-                        print(f"Failed to fetch data after {max_attempts} attempts")
-                        return None
+        # retries and hedging of the reads (see RetryPolicy)
+        def fetch_data(timestep, res, x1, y1, x2, y2, fieldname):
+            try:
+                return self.retry_policy.call(self.db.read, time=timestep, max_resolution=res, logic_box=[(x1, y1), (x2, y2)], field=fieldname)
+            except Exception as e:
+                print(f"Failed to fetch data after {self.retry_policy.max_attempts} attempts ({e})")
+                return None
 
         def fetch_all_data(t1, t2, res, x1, y1, x2, y2, fieldname, max_workers=8):
             data = []
             with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = [executor.submit(fetch_data, time, res, x1, y1, x2, y2, fieldname) for time in range(t1, t2)]
+                futures = [executor.submit(fetch_data, timestep, res, x1, y1, x2, y2, fieldname) for timestep in range(t1, t2)]
                 for future in futures:
                     data.append(future.result())
             return data
@@ -116,7 +216,10 @@ class OpenVisusBackendArray(xr.backends.common.BackendArray):
             if isinstance(self.timesteps,int):
                 data=self.db.read(time=self.timesteps,max_resolution=res, logic_box=[(x1,y1),(x2,y2)],field=self.fieldname)
             else:
-                if isinstance(t1,int) and isinstance(res,int) and isinstance(t2,int):
+                if isinstance(t1,int) and isinstance(res,int) and isinstance(t2,int) and t2-t1==1:
+                    data = [self._readTimestep(t1, res, [(x1,y1),(x2,y2)], self.fieldname)]
+
+                elif isinstance(t1,int) and isinstance(res,int) and isinstance(t2,int):
                     data = fetch_all_data(t1, t2, res, x1, y1, x2, y2, self.fieldname, max_workers)
 
                 else:
@@ -152,7 +255,7 @@ class OpenVisusBackendArray(xr.backends.common.BackendArray):
                 if isinstance(t1, int) and isinstance(res,int):
                     x1,x2=self._getXRange(key[3])
 
-                    data=self.db.read(time=t1, max_resolution=res,logic_box=[(x1,y1,z1),(x2,y2,z2)])
+                    data=self._readTimestep(t1, res, [(x1,y1,z1),(x2,y2,z2)], self.fieldname)
                 else:
                     data=self.db.read(logic_box=[(x1,y1,z1),(x2,y2,z2)],field=self.fieldname)                
         else:
@@ -172,30 +275,214 @@ class OpenVisusBackendArray(xr.backends.common.BackendArray):
                                                           self._raw_indexing_method)
 
 
+# ////////////////////////////////////////////////////////////////////////////////
+class MetadataCatalog:
+    """
+    On-disk catalog, keyed by url, of parsed idx headers (point dim, logic size, max resolution, timesteps, field dtypes)
+    and of NetCDF sidecars (see SidecarToMetadata).
+    Local files are validated by mtime/size. Remote ones are validated by ETag/Last-Modified with a HEAD request.
+    That check runs at most once every `max_age` seconds (VISUS_METADATA_CATALOG_MAX_AGE, default 1 hour; 0 checks at every open).
+    Between checks a warm open does not need any network round trip.
+    A remote entry without a validator is trusted for `max_age` seconds, then read again.
+    """
+
+    # constructor
+    def __init__(self, cache_dir=None, max_age=None):
+        if cache_dir is None:
+            cache_dir=os.path.join(os.environ.get("VISUS_CACHE",os.path.expanduser("~/visus/cache")),"metadata-catalog")
+        if max_age is None:
+            max_age=float(os.environ.get("VISUS_METADATA_CATALOG_MAX_AGE",3600))
+        self.cache_dir=cache_dir
+        self.max_age=max_age
+
+    # getFilename
+    def getFilename(self, url, kind="idx"):
+        key=url if kind=="idx" else f"{kind}:{url}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest()+".json")
+
+    # getValidator
+    def getValidator(self, url):
+        if os.path.isfile(url):
+            st=os.stat(url)
+            return {"mtime": st.st_mtime, "size": st.st_size}
+        if url.startswith("http"):
+            try:
+                response=requests.head(url, allow_redirects=True, timeout=10)
+                etag,last_modified=response.headers.get("ETag"),response.headers.get("Last-Modified")
+                if response.ok and (etag or last_modified):
+                    return {"etag": etag, "last-modified": last_modified}
+            except Exception as e:
+                print(f"MetadataCatalog cannot validate url={url} error={e}")
+        return None
+
+    # get
+    def get(self, url, kind="idx"):
+        filename=self.getFilename(url, kind)
+        try:
+            with open(filename,"r") as f:
+                entry=json.load(f)
+        except Exception:
+            return None
+
+        if entry.get("url")!=url:
+            return None
+
+        # local files are cheap to validate
+        if not url.startswith("http"):
+            return entry["metadata"] if entry["validator"] is not None and entry["validator"]==self.getValidator(url) else None
+
+        # remote: trust the entry for `max_age` seconds
+        if (time.time()-entry["checked"])<self.max_age:
+            return entry["metadata"]
+
+        validator=self.getValidator(url)
+        if validator is None or validator!=entry["validator"]:
+            return None
+
+        entry["checked"]=time.time()
+        self.write(filename, entry)
+        return entry["metadata"]
+
+    # put
+    def put(self, url, metadata, kind="idx"):
+        self.write(self.getFilename(url, kind),{
+            "url": url,
+            "validator": self.getValidator(url),
+            "checked": time.time(),
+            "metadata": metadata
+        })
+
+    # write (atomic, so concurrent readers never see a partial entry)
+    def write(self, filename, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_filename=f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_filename,"w") as f:
+            json.dump(entry, f, default=ToJSON)
+        os.replace(tmp_filename, filename)
+
+
+# ////////////////////////////////////////////////////////////////////////////////
+def ToJSON(value):
+    """
+    numpy values of NetCDF attributes
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# ////////////////////////////////////////////////////////////////////////////////
+def SidecarToMetadata(ds, idx_urls, fields, max_size=1024*1024):
+    """
+    What open_dataset needs from a NetCDF sidecar: global attributes, idx urls, and dims/attrs/dtype of each variable.
+    Variable values are kept too, except for the idx fields (OpenVisus provides those).
+    Returns None if another variable has more than `max_size` values (the sidecar is then opened every time)
+    """
+    variables={}
+    for name,var in ds.variables.items():
+        item={"dims": list(var.dims), "shape": [int(it) for it in var.shape], "dtype": var.dtype.str, "attrs": dict(var.attrs)}
+        if name not in fields:
+            if var.size>max_size:
+                return None
+            item["data"]=var.values.tolist()
+        variables[name]=item
+    return {"attrs": dict(ds.attrs), "idx_urls": idx_urls, "coords": list(ds.coords), "variables": variables}
+
+# ////////////////////////////////////////////////////////////////////////////////
+def SidecarFromMetadata(metadata):
+    variables={}
+    for name,item in metadata["variables"].items():
+        dtype=np.dtype(item["dtype"])
+        if "data" in item:
+            data=np.array(item["data"], dtype=dtype)
+        else:
+            # an idx field: its values come from OpenVisus. This placeholder is read-only and uses no memory
+            data=np.broadcast_to(np.array(np.nan if dtype.kind=="f" else 0, dtype=dtype), item["shape"])
+        variables[name]=xr.Variable(item["dims"], data, attrs=item["attrs"])
+    coords={name: variables.pop(name) for name in metadata["coords"]}
+    return xr.Dataset(data_vars=variables, coords=coords, attrs=metadata["attrs"])
+
+
+# ////////////////////////////////////////////////////////////////////////////////
+class LazyIdxDataset:
+    """
+    Dataset metadata coming from the catalog, the OpenVisus dataset is loaded only on the first read
+    """
+
+    # constructor
+    def __init__(self, url, metadata, db=None):
+        self.url=url
+        self.metadata=metadata
+        self.db=db
+        self.lock=threading.Lock()
+
+    # getDb
+    def getDb(self):
+        with self.lock:
+            if self.db is None:
+                print(f"ov.LoadDataset({self.url})")
+                self.db=ov.LoadDataset(self.url)
+            return self.db
+
+    # getPointDim
+    def getPointDim(self):
+        return self.metadata["pdim"]
+
+    # getLogicSize
+    def getLogicSize(self):
+        return self.metadata["dims"]
+
+    # getMaxResolution
+    def getMaxResolution(self):
+        return self.metadata["maxh"]
+
+    # getTimesteps
+    def getTimesteps(self):
+        return self.metadata["timesteps"]
+
+    # getFields
+    def getFields(self):
+        return list(self.metadata["fields"])
+
+    # read
+    def read(self, **kwargs):
+        return self.getDb().read(**kwargs)
+
+
 # ////////////////////////////////////////////////////////////////////////////////
 class OpenVisusBackendEntrypoint(xr.backends.common.BackendEntrypoint):
     """
     A custom xarray backend to handle netcdf files containing idx url. It enables loading the data at different level of resolutions and quality as needed.
     """
     # needed bu xarray (list here all arguments specific for the backend)
-    open_dataset_parameters = ["filename_or_obj", "drop_variables", "resolution", "timesteps","coordinates","prefer"]
+    open_dataset_parameters = ["filename_or_obj", "drop_variables", "resolution", "timesteps","coordinates","prefer","readahead","readahead_max_bytes","use_catalog","catalog_max_age"]
     
     # open_dataset (needed by the backend)
-    def open_dataset(self,filename_or_obj,*, resolution=None, timesteps=None,drop_variables=None,coords=None,attrs=None,dims=None, prefer=None, **kwargs):
+    def open_dataset(self,filename_or_obj,*, resolution=None, timesteps=None,drop_variables=None,coords=None,attrs=None,dims=None, prefer=None, readahead=4, readahead_max_bytes=256*1024*1024, use_catalog=True, catalog_max_age=None, **kwargs):
 
         self.resolution=resolution
+        # read-ahead arrays of this dataset, closed with it (the entrypoint can open several datasets)
+        arrays=[]
         
         self.coordinates=coords
         data_vars={}
 
-        ds=xr.open_dataset(filename_or_obj,decode_times=False, **kwargs)
-        if drop_variables!= None:
-            for i in drop_variables:
-                ds=ds.drop(i)
-        if 'time' in ds:
-            ds=ds.drop('time')
-        # i can have multiple versions of urls {remote:..., "local":...}
-        idx_urls=eval(ds.attrs.get("idx_urls","{}"))
+        # the sidecar comes from the catalog, unless it changed (see MetadataCatalog)
+        catalog=MetadataCatalog(max_age=catalog_max_age) if use_catalog else None
+        sidecar_key=filename_or_obj if catalog is not None and isinstance(filename_or_obj,str) and not kwargs else None
+        sidecar=catalog.get(sidecar_key, kind="sidecar") if sidecar_key else None
+        if sidecar is not None:
+            ds=SidecarFromMetadata(sidecar)
+            idx_urls=sidecar["idx_urls"]
+        else:
+            ds=xr.open_dataset(filename_or_obj,decode_times=False, **kwargs)
+            # i can have multiple versions of urls {remote:..., "local":...}
+            idx_urls=eval(ds.attrs.get("idx_urls","{}"))
+
         if prefer is not None:
             idx_url=idx_urls[prefer]
         elif idx_urls:
@@ -204,8 +491,18 @@ class OpenVisusBackendEntrypoint(xr.backends.common.BackendEntrypoint):
             idx_url=ds.attrs['idx_url']
         else:
             idx_url=ds.attrs['idx_url']
-        print(f"ov.LoadDataset({idx_url})")
-        db=ov.LoadDataset(idx_url)
+        db=self.loadDataset(idx_url, catalog=catalog)
+
+        if sidecar is None and sidecar_key:
+            sidecar=SidecarToMetadata(ds, idx_urls, fields=db.getFields())
+            if sidecar is not None:
+                catalog.put(sidecar_key, sidecar, kind="sidecar")
+
+        if drop_variables!= None:
+            for i in drop_variables:
+                ds=ds.drop(i)
+        if 'time' in ds:
+            ds=ds.drop('time')
 
         self.timesteps=timesteps
         dim=db.getPointDim()
@@ -216,13 +513,10 @@ class OpenVisusBackendEntrypoint(xr.backends.common.BackendEntrypoint):
             
         # convert OpenVisus fields into xarray variables
         for fieldname in db.getFields():
-            print(fieldname)
-            field=db.getField(fieldname)
+            field=db.metadata["fields"][fieldname]
             
-            ncomponents=field.dtype.ncomponents()
-            atomic_dtype=field.dtype.get(0)
-
-            dtype=self.toNumPyDType(atomic_dtype)
+            ncomponents=field["ncomponents"]
+            dtype=np.dtype(field["dtype"])
             shape=list(reversed(dims))
            
             
@@ -247,16 +541,18 @@ class OpenVisusBackendEntrypoint(xr.backends.common.BackendEntrypoint):
                 else:
                     shape.insert(0,len(self.timesteps))
       
-            data_vars[fieldname]=xr.Variable(
-                labels,
-                xr.core.indexing.LazilyIndexedArray(OpenVisusBackendArray(db=db, shape=shape,dtype=dtype,
+            array=OpenVisusBackendArray(db=db, shape=shape,dtype=dtype,
                 fieldname=fieldname,
                                                                           timesteps=self.timesteps,
-                                                                          resolution=self.resolution)),
+                                                                          resolution=self.resolution,
+                                                                          readahead=readahead,
+                                                                          readahead_max_bytes=readahead_max_bytes)
+            arrays.append(array)
+            data_vars[fieldname]=xr.Variable(
+                labels,
+                xr.core.indexing.LazilyIndexedArray(array),
                 attrs=ds[fieldname].attrs
             )
-            print("Adding field ",fieldname,"shape ",shape,"dtype ",dtype,"labels ",labels,
-                 "Max Resolution ", db.getMaxResolution())            
         ds1 = xr.Dataset(data_vars=data_vars,attrs=ds.attrs)
         coord_name=[i for i in ds.coords]
 
@@ -269,9 +565,35 @@ class OpenVisusBackendEntrypoint(xr.backends.common.BackendEntrypoint):
                 ds1[var] = ds[var]
 
         ds1.attrs=ds.attrs
-        ds1.set_close(self.close_method)
+        ds1.set_close(lambda: self.close_method(arrays))
         return ds1
     
+    # loadDataset (the OpenVisus dataset is loaded lazily if the metadata is already in the catalog)
+    def loadDataset(self, idx_url, catalog=None):
+        metadata=catalog.get(idx_url) if catalog else None
+        if metadata is not None:
+            return LazyIdxDataset(idx_url, metadata)
+
+        print(f"ov.LoadDataset({idx_url})")
+        db=ov.LoadDataset(idx_url)
+        fields={}
+        for fieldname in db.getFields():
+            field=db.getField(fieldname)
+            fields[fieldname]={
+                "ncomponents": int(field.dtype.ncomponents()),
+                "dtype": self.toNumPyDType(field.dtype.get(0)).str
+            }
+        metadata={
+            "pdim": int(db.getPointDim()),
+            "dims": [int(it) for it in db.getLogicSize()],
+            "maxh": int(db.getMaxResolution()),
+            "timesteps": [int(it) for it in db.getTimesteps()],
+            "fields": fields
+        }
+        if catalog:
+            catalog.put(idx_url, metadata)
+        return LazyIdxDataset(idx_url, metadata, db=db)
+
     # toNumPyDType (always pass the atomic OpenVisus type i.e. uint8[8] should not be accepted)
     def toNumPyDType(self,atomic_dtype):
         """
@@ -286,8 +608,9 @@ class OpenVisusBackendEntrypoint(xr.backends.common.BackendEntrypoint):
         ]))
 
     # close_method (needed for the OpenVisus backend)
-    def close_method(self):
-        print("nothing to do here")
+    def close_method(self, arrays):
+        for array in arrays:
+            array.close()
     
     # guess_can_open (needed for the OpenVisus backend)
     def guess_can_open(self, filename_or_obj):
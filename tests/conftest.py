@@ -0,0 +1,11 @@
+import pytest
+
+from synthetic import CreateSyntheticIdx
+
+# ////////////////////////////////////////////////////////////
+@pytest.fixture(scope="session")
+def idx_url(tmp_path_factory):
+	"""
+	small local 2D dataset (see benchmarks/synthetic.py)
+	"""
+	return CreateSyntheticIdx(str(tmp_path_factory.mktemp("synthetic")), "2d-uint8-256", [256,256], "uint8")
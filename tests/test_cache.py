@@ -0,0 +1,75 @@
+import os,time,subprocess,sys
+
+from openvisuspy.cache import CacheManager,GetCacheManager
+
+# ////////////////////////////////////////////////////////////
+def WriteFile(cache_dir, name, size=100):
+	filename=os.path.join(str(cache_dir), name)
+	os.makedirs(os.path.dirname(filename), exist_ok=True)
+	with open(filename,"wb") as f:
+		f.write(b"x"*size)
+	return filename
+
+# ////////////////////////////////////////////////////////////
+def test_evicts_least_recently_used_over_the_cap(tmp_path):
+	cache=CacheManager(str(tmp_path), max_bytes=250)
+	a,b,c=[WriteFile(tmp_path, name) for name in ["a","b","c"]]
+	cache.add(a); time.sleep(0.01)
+	cache.add(b); time.sleep(0.01)
+	cache.touch(a); time.sleep(0.01)
+	cache.add(c)
+	assert [os.path.isfile(it) for it in [a,b,c]]==[True,False,True]
+	report=cache.getReport()
+	assert report["num_entries"]==2 and report["total_bytes"]==200 and report["bytes_evicted"]==100
+
+# ////////////////////////////////////////////////////////////
+def test_pinned_entries_survive_eviction(tmp_path):
+	cache=CacheManager(str(tmp_path), max_bytes=100)
+	signal,level,other=[WriteFile(tmp_path, name) for name in ["signal.npy","signal.12.npy","signal2.npy"]]
+	cache.pin(os.path.join(str(tmp_path), "signal"))
+	for it in [signal,level,other]:
+		cache.add(it)
+		time.sleep(0.01)
+	# `signal` does not pin `signal2.npy`
+	assert [os.path.isfile(it) for it in [signal,level,other]]==[True,True,False]
+
+	cache.unpin(os.path.join(str(tmp_path), "signal"))
+	cache.evict()
+	assert [os.path.isfile(it) for it in [signal,level]]==[False,True]
+
+# ////////////////////////////////////////////////////////////
+def test_pins_of_dead_processes_are_dropped(tmp_path):
+	cache=CacheManager(str(tmp_path), max_bytes=100)
+	process=subprocess.Popen([sys.executable, "-c", "pass"])
+	process.wait()
+	with cache.connect() as conn:
+		conn.execute("INSERT INTO pins(prefix,pid) VALUES(?,?)",(os.path.join(str(tmp_path), "signal"),process.pid))
+	cache.pin(os.path.join(str(tmp_path), "other"))
+	assert cache.getReport()["num_pinned"]==1
+	with cache.connect() as conn:
+		assert conn.execute("SELECT pid FROM pins").fetchall()==[(os.getpid(),)]
+
+	signal,level=[WriteFile(tmp_path, name) for name in ["signal.npy","signal.12.npy"]]
+	cache.add(signal); time.sleep(0.01)
+	cache.add(level)
+	assert [os.path.isfile(it) for it in [signal,level]]==[False,True]
+
+# ////////////////////////////////////////////////////////////
+def test_hit_miss_counters(tmp_path):
+	cache=CacheManager(str(tmp_path))
+	filename=WriteFile(tmp_path, "a", size=10)
+	cache.add(filename)
+	cache.touch(filename)
+	cache.touch(filename)
+	# files outside the cache directory are not accounted
+	cache.touch(str(tmp_path / ".." / "outside"))
+	report=cache.getReport()
+	assert report["misses"]==1 and report["hits"]==2 and report["hit_rate"]==2/3
+	assert report["bytes_written"]==10 and report["bytes_saved"]==20
+
+# ////////////////////////////////////////////////////////////
+def test_existing_files_are_indexed(tmp_path):
+	WriteFile(tmp_path, "http/host/80/a")
+	WriteFile(tmp_path, "http/host/80/b.part")
+	report=GetCacheManager(str(tmp_path)).getReport()
+	assert report["num_entries"]==1 and report["total_bytes"]==100
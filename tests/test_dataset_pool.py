@@ -0,0 +1,30 @@
+import time
+
+from openvisuspy.backend import DatasetPool
+
+# ////////////////////////////////////////////////////////////
+def test_idle_entries_expire_without_further_releases():
+	pool=DatasetPool(idle_timeout=0.2, collect_sec=0.05)
+	destroyed=[]
+	value=pool.acquire("url", lambda: object(), destroy=destroyed.append)
+	assert pool.acquire("url", lambda: object()) is value
+	pool.release("url")
+	pool.release("url")
+	# the release itself is too early to destroy it
+	assert pool.getStats()=={"url": 0} and not destroyed
+
+	# nobody touches the pool anymore, the collector thread does it
+	T1=time.time()
+	while pool.getStats() and time.time()-T1<5.0:
+		time.sleep(0.01)
+	assert pool.getStats()=={}
+	assert destroyed==[value]
+
+# ////////////////////////////////////////////////////////////
+def test_held_entries_do_not_expire():
+	pool=DatasetPool(idle_timeout=0.0, collect_sec=0.05)
+	pool.acquire("url", lambda: object())
+	time.sleep(0.2)
+	assert pool.getStats()=={"url": 1}
+	pool.release("url")
+	assert pool.getStats()=={}
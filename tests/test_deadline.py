@@ -0,0 +1,44 @@
+import time
+
+from openvisuspy.backend import Aborted,QueryDeadline
+
+# ////////////////////////////////////////////////////////////
+def Refinements(aborted, delays, closed):
+	"""
+	progressive results, each one `delay` seconds after the previous one (stops as soon as it is aborted)
+	"""
+	try:
+		for I,delay in enumerate(delays):
+			T1=time.time()
+			while time.time()-T1<delay:
+				if aborted.isTrue(): return
+				time.sleep(0.005)
+			yield {"H": 10+I, "running": I<len(delays)-1}
+	finally:
+		closed.append(True)
+
+# ////////////////////////////////////////////////////////////
+def test_expired_while_reading_repeats_the_last_refinement():
+	aborted,closed=Aborted(),[]
+	results=list(QueryDeadline(200, aborted).filter(Refinements(aborted, [0.0, 0.0, 5.0], closed)))
+	assert [it["H"] for it in results]==[10,11,11]
+	assert not results[-1]["running"] and results[-1]["deadline_hit"] and results[-1]["deadline_h"]==11
+	assert aborted.isTrue() and closed
+
+# ////////////////////////////////////////////////////////////
+def test_late_refinement_is_the_final_one():
+	aborted,closed=Aborted(),[]
+	deadline=QueryDeadline(100, aborted)
+	deadline.cancel() # no timer, the late result itself stops the query
+	results=list(deadline.filter(Refinements(aborted, [0.0, 0.2, 0.0], closed)))
+	assert [it["H"] for it in results]==[10,11]
+	assert not results[-1]["running"] and results[-1]["deadline_hit"] and results[-1]["deadline_h"]==10
+	assert aborted.isTrue() and closed
+
+# ////////////////////////////////////////////////////////////
+def test_keep_refining():
+	aborted,closed=Aborted(),[]
+	results=list(QueryDeadline(100, aborted, keep_refining=True).filter(Refinements(aborted, [0.0, 0.2, 0.0], closed)))
+	assert [it["H"] for it in results]==[10,11,12]
+	assert [it["deadline_hit"] for it in results]==[False,True,True]
+	assert not aborted.isTrue() and closed
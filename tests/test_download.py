@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from openvisuspy.download import DownloadEngine,HttpSource
+from openvisuspy.retry    import RetryPolicy
+from openvisuspy.standin  import StandInServer
+
+# ////////////////////////////////////////////////////////////
+class FailingSource(HttpSource):
+	"""
+	fails the range starting at `fail_at` (i.e. the transfer is interrupted there)
+	"""
+
+	def __init__(self, url, fail_at=None):
+		super().__init__(url)
+		self.fail_at=fail_at
+		self.ranges=[]
+
+	def readRange(self, start, end, etag=None):
+		if start==self.fail_at:
+			raise Exception("connection lost")
+		self.ranges.append(start)
+		return super().readRange(start, end, etag=etag)
+
+# ////////////////////////////////////////////////////////////
+@pytest.fixture
+def server(tmp_path):
+	os.makedirs(tmp_path / "root" / "bucket")
+	with open(tmp_path / "root" / "bucket" / "object","wb") as f:
+		f.write(os.urandom(10*1024))
+	with StandInServer(str(tmp_path / "root")) as server:
+		yield server
+
+# ////////////////////////////////////////////////////////////
+def test_download_resumes(server, tmp_path):
+	url=f"{server.getUrl()}/bucket/object"
+	local_filename=str(tmp_path / "cache" / "object")
+	engine=DownloadEngine(num_threads=1, part_size=1024, retry_policy=RetryPolicy(max_attempts=1, hedge_percentile=0))
+
+	first=FailingSource(url, fail_at=5*1024)
+	with pytest.raises(Exception):
+		engine.download(first, local_filename)
+	assert not os.path.isfile(local_filename)
+	assert os.path.isfile(local_filename + ".part") and os.path.isfile(local_filename + ".part.json")
+
+	# only the missing ranges are read again
+	source=FailingSource(url)
+	assert engine.download(source, local_filename)==local_filename
+	assert 5*1024 in source.ranges and not set(source.ranges) & set(first.ranges)
+	assert sorted(source.ranges+first.ranges)==[I*1024 for I in range(10)]
+	with open(local_filename,"rb") as a, open(tmp_path / "root" / "bucket" / "object","rb") as b:
+		assert a.read()==b.read()
+
+	# nothing is left behind
+	assert sorted(os.listdir(tmp_path / "cache"))==["object"]
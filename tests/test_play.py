@@ -0,0 +1,27 @@
+import pytest
+
+from openvisuspy.play    import PlayEngine
+from openvisuspy.backend import LoadDataset
+
+from synthetic import CreateSyntheticSignal
+
+# ////////////////////////////////////////////////////////////
+@pytest.fixture(scope="module")
+def signal_url(tmp_path_factory):
+	return CreateSyntheticSignal(str(tmp_path_factory.mktemp("synthetic")), "1d-int64-64k", 1<<16)
+
+# ////////////////////////////////////////////////////////////
+@pytest.mark.parametrize("name,max_pixels,shapes", [
+	("signal_url", 4096,    [(4096,),(2048,),(1024,)]),
+	("idx_url",    128*128, [(128,128),(64,64),(32,32)]),
+])
+def test_coarsen_step_halves_the_resolution(name, max_pixels, shapes, request):
+	url=request.getfixturevalue(name)
+	db=LoadDataset(url)
+	pdim=db.getPointDim()
+	engine=PlayEngine(url, [0], db.getField(), [[0]*pdim,[int(it) for it in db.getLogicSize()]], pdim, max_pixels=max_pixels)
+	try:
+		assert [engine.doFetchFrame(0, coarsen)["data"].shape for coarsen in range(3)]==shapes
+	finally:
+		engine.stop()
+		db.close()
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from openvisuspy.retry import RetryPolicy
+
+# ////////////////////////////////////////////////////////////
+class Flaky:
+	"""
+	fails the first `num_failures` calls
+	"""
+
+	def __init__(self, num_failures):
+		self.num_failures=num_failures
+		self.num_calls=0
+
+	def __call__(self, value):
+		self.num_calls+=1
+		if self.num_calls<=self.num_failures:
+			raise Exception("transient error")
+		return value
+
+# ////////////////////////////////////////////////////////////
+def test_retries_until_success():
+	policy=RetryPolicy(max_attempts=3, base_delay=0.001, hedge_percentile=0)
+	fn=Flaky(2)
+	assert policy.call(fn, 42)==42
+	assert fn.num_calls==3
+	assert policy.getInfo()["retries"]==2
+
+# ////////////////////////////////////////////////////////////
+def test_gives_up_after_max_attempts():
+	policy=RetryPolicy(max_attempts=3, base_delay=0.001, hedge_percentile=0)
+	fn=Flaky(10)
+	with pytest.raises(Exception):
+		policy.call(fn, 42)
+	assert fn.num_calls==3
+	assert policy.getInfo()["failures"]==1
+
+# ////////////////////////////////////////////////////////////
+def test_cancelled_does_not_retry():
+	policy=RetryPolicy(max_attempts=3, base_delay=0.001, hedge_percentile=0)
+	fn=Flaky(10)
+	with pytest.raises(Exception):
+		policy.call(fn, 42, cancelled=lambda: True)
+	assert fn.num_calls==1
+
+# ////////////////////////////////////////////////////////////
+def test_backoff_is_bounded():
+	policy=RetryPolicy(base_delay=0.1, max_delay=0.5)
+	for attempt in range(10):
+		assert 0.0<=policy.getBackoff(attempt)<=min(0.5, 0.1*2**attempt)
+
+# ////////////////////////////////////////////////////////////
+def test_no_hedging_without_enough_samples():
+	policy=RetryPolicy(hedge_min_samples=20)
+	for I in range(19): policy.addLatency(0.01)
+	assert policy.getHedgeDelay() is None
+	policy.addLatency(0.01)
+	assert policy.getHedgeDelay()==pytest.approx(0.05) # hedge_min_delay
+
+# ////////////////////////////////////////////////////////////
+def test_hedged_call_wins_over_a_stall():
+	policy=RetryPolicy(hedge_percentile=95, hedge_min_delay=0.01, hedge_min_samples=5)
+	for I in range(5): policy.addLatency(0.01)
+	calls=[]
+	def Read():
+		calls.append(time.time())
+		index=len(calls)
+		# the first call stalls, the duplicate is fast
+		time.sleep(2.0 if index==1 else 0.0)
+		return index
+	t1=time.time()
+	assert policy.call(Read)==2
+	assert time.time()-t1<1.0
+	info=policy.getInfo()
+	assert info["hedges"]==1 and info["hedge_wins"]==1
@@ -0,0 +1,61 @@
+import time,types
+
+from openvisuspy.backend  import GetDatasetPool
+from openvisuspy.sessions import SessionManager
+
+from common    import CreateHeadlessSlice,RunSliceUntilFinished
+from synthetic import CreateSyntheticIdx
+
+# ////////////////////////////////////////////////////////////
+class FakeSlice:
+
+	def __init__(self, id, idle_sec=0.0, playing=False):
+		self.id=id
+		self.last_activity=time.time()-idle_sec
+		self.play=types.SimpleNamespace(is_playing=playing)
+		self.closed=False
+
+	def close(self):
+		self.closed=True
+
+	def getMemoryInfo(self):
+		return {"threads": 0 if self.closed else 1, "nbytes": 0 if self.closed else 100}
+
+# ////////////////////////////////////////////////////////////
+def test_check_idle():
+	manager=SessionManager(idle_timeout=60)
+	idle,active,playing=FakeSlice(1, idle_sec=120), FakeSlice(2), FakeSlice(3, idle_sec=120, playing=True)
+	for session_id,slice in [("idle",idle),("active",active),("playing",playing)]:
+		manager.register(slice, session_id)
+	manager.sessions["idle"].t1-=120
+	manager.sessions["playing"].t1-=120
+
+	manager.checkIdle()
+	assert [idle.closed,active.closed,playing.closed]==[True,False,False]
+	info=manager.getInfo()
+	assert sorted(info["sessions"])==["active","playing"]
+	assert info["idle"]==1 and info["released_nbytes"]==100
+
+# ////////////////////////////////////////////////////////////
+def test_destroy_releases_the_slice(tmp_path):
+	url=CreateSyntheticIdx(str(tmp_path), "2d-uint8-256", [256,256], "uint8")
+	slice=CreateHeadlessSlice(url, width=256, height=256)
+	slice.start()
+	assert RunSliceUntilFinished(slice, timeout=30.0) is not None
+	worker=slice.db.thread
+
+	manager=SessionManager()
+	manager.register(slice, "session")
+	info=manager.destroy("session")
+	assert info["slices"]==1 and info["threads"]==1 and info["nbytes"]>0
+	assert manager.destroy("session") is None
+	assert manager.getInfo()["live"]==0
+
+	# the worker exits in background, then the dataset goes back to the pool
+	worker.join(timeout=10.0)
+	assert not worker.is_alive()
+	assert slice.db is None and slice.idle_callback is None
+	T1=time.time()
+	while GetDatasetPool().getStats().get(url,0)>0 and time.time()-T1<10.0:
+		time.sleep(0.01)
+	assert GetDatasetPool().getStats().get(url,0)==0
@@ -0,0 +1,133 @@
+import time,threading
+
+from openvisuspy import singleflight
+from openvisuspy.backend import Aborted,BaseDataset,GetDatasetPool
+from openvisuspy.singleflight import SingleFlight
+
+from common import CreateHeadlessSlice,RunSliceUntilFinished
+
+# ////////////////////////////////////////////////////////////
+class FakeDataset:
+
+	def __init__(self, url):
+		self.url=url
+		self.closed=False
+
+	def close(self):
+		self.closed=True
+
+# ////////////////////////////////////////////////////////////
+def FakeRunBoxQuery(steps, started=None):
+	"""
+	each step is (sec to wait, H), the last one is the final refinement
+	"""
+	def Run(db, kwargs):
+		if started is not None: started.set()
+		for I,(sec,H) in enumerate(steps):
+			time.sleep(sec)
+			if kwargs["aborted"].isTrue():
+				return
+			yield {"I": I, "H": H, "running": I<len(steps)-1}
+	return Run
+
+# ////////////////////////////////////////////////////////////
+def Collect(flights, url, kwargs, aborted=None, **deadline):
+	ret=[]
+	def Run():
+		ret.extend(flights.execute(url, kwargs, aborted or Aborted(), **deadline))
+	thread=threading.Thread(target=Run)
+	thread.start()
+	return thread,ret
+
+# ////////////////////////////////////////////////////////////
+def test_identical_queries_share_one_execution(monkeypatch):
+	datasets=[]
+	monkeypatch.setattr(singleflight, "LoadDataset", lambda url: datasets.append(FakeDataset(url)) or datasets[-1])
+	started=threading.Event()
+	monkeypatch.setattr(singleflight, "RunBoxQuery", FakeRunBoxQuery([(0.0,10),(0.2,12),(0.2,14)], started=started))
+
+	flights=SingleFlight(2)
+	kwargs={"timestep":0, "field":"data", "logic_box":[[0,0],[256,256]], "max_pixels":1024}
+	a,results_a=Collect(flights, "url", kwargs)
+	started.wait()
+	b,results_b=Collect(flights, "url", dict(kwargs))
+	a.join(); b.join()
+
+	assert flights.getInfo()["executions"]==1
+	assert flights.getInfo()["joins"]==1
+	assert [it["H"] for it in results_a]==[10,12,14]
+	assert results_b[-1]["H"]==14 and not results_b[-1]["running"]
+	# each session gets its own copy, the flight gives back its dataset
+	assert results_a[-1] is not results_b[-1]
+	assert len(datasets)==1 and datasets[0].closed
+
+# ////////////////////////////////////////////////////////////
+def test_aborted_when_nobody_waits(monkeypatch):
+	monkeypatch.setattr(singleflight, "LoadDataset", FakeDataset)
+	started=threading.Event()
+	monkeypatch.setattr(singleflight, "RunBoxQuery", FakeRunBoxQuery([(0.0,10),(5.0,12)], started=started))
+
+	flights=SingleFlight(1)
+	aborted=Aborted()
+	thread,results=Collect(flights, "url", {"timestep":0}, aborted=aborted)
+	started.wait()
+	flight=next(iter(flights.flights.values()))
+	aborted.setTrue()
+	thread.join(timeout=2.0)
+	assert not thread.is_alive()
+	assert flight.aborted.isTrue()
+	assert flights.getInfo()["aborted"]==1
+
+# ////////////////////////////////////////////////////////////
+def test_late_joiner_has_its_own_deadline(monkeypatch):
+	monkeypatch.setattr(singleflight, "LoadDataset", FakeDataset)
+	started=threading.Event()
+	monkeypatch.setattr(singleflight, "RunBoxQuery", FakeRunBoxQuery([(0.0,10),(0.5,12),(0.5,14)], started=started))
+
+	flights=SingleFlight(1)
+	a,results_a=Collect(flights, "url", {"timestep":0}, deadline_ms=2000)
+	started.wait()
+	time.sleep(0.3)
+	# the budget of the late joiner starts now: H=12 comes in time, H=14 does not
+	b,results_b=Collect(flights, "url", {"timestep":0}, deadline_ms=500)
+	a.join(); b.join()
+
+	assert [it["H"] for it in results_a]==[10,12,14]
+	assert [it["H"] for it in results_b]==[10,12,12]
+	assert not results_b[-1]["running"] and results_b[-1]["deadline_hit"]
+
+# ////////////////////////////////////////////////////////////
+def test_flight_gives_back_the_dataset(idx_url):
+	flights=SingleFlight(1)
+	results=list(flights.execute(idx_url, {"timestep":0, "logic_box":[[0,0],[256,256]], "max_pixels":256*256, "num_refinements":2}, Aborted()))
+	assert results and not results[-1]["running"]
+	assert GetDatasetPool().getStats()[idx_url]==0
+
+# ////////////////////////////////////////////////////////////
+class BrokenDataset:
+
+	def getUrl(self):
+		return "broken"
+
+	def acquireAccess(self):
+		raise Exception("cannot read")
+
+def test_failed_job_does_not_kill_the_worker():
+	worker=BaseDataset("broken")
+	worker.start()
+	worker.pushJob(BrokenDataset(), timestep=0)
+	worker.waitIdle()
+	assert worker.thread.is_alive()
+	worker.stop()
+
+# ////////////////////////////////////////////////////////////
+def test_headless_slice_single_flight(idx_url, monkeypatch):
+	monkeypatch.setattr("openvisuspy.backend.DEFAULT_SINGLE_FLIGHT", True)
+	slice=CreateHeadlessSlice(idx_url, width=256, height=256)
+	slice.start()
+	try:
+		assert RunSliceUntilFinished(slice, timeout=30.0) is not None
+		assert slice.events and not slice.events[-1]["running"]
+		assert slice.db.thread.is_alive()
+	finally:
+		slice.close()
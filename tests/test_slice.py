@@ -0,0 +1,41 @@
+import gc,time
+
+import pytest
+
+from openvisuspy.backend import GetDatasetPool
+
+from common    import CreateHeadlessSlice,RunSliceUntilFinished
+from synthetic import CreateSyntheticIdx
+
+# ////////////////////////////////////////////////////////////
+@pytest.fixture(scope="module")
+def volume_url(tmp_path_factory):
+	return CreateSyntheticIdx(str(tmp_path_factory.mktemp("synthetic")), "3d-uint16-64", [64,64,64], "uint16")
+
+# ////////////////////////////////////////////////////////////
+@pytest.mark.parametrize("name", ["idx_url","volume_url"])
+@pytest.mark.parametrize("options", [
+	{},
+	{"tiled": True},
+	{"concurrent_refinements": True},
+	{"deadline_ms": 5000},
+])
+def test_headless_slice_renders(name, options, request):
+	url=request.getfixturevalue(name)
+	slice=CreateHeadlessSlice(url, width=256, height=256)
+	for key,value in options.items():
+		setattr(slice, key, value)
+	slice.start()
+	try:
+		assert RunSliceUntilFinished(slice, timeout=30.0) is not None
+		last=slice.events[-1]
+		assert not last["running"] and last["nbytes"]>0
+	finally:
+		slice.close()
+
+	# every dataset object (session, single flight, tile and refinement reads) has been given back to the pool
+	T1=time.time()
+	while GetDatasetPool().getStats().get(url,0)>0 and time.time()-T1<10.0:
+		gc.collect()
+		time.sleep(0.01)
+	assert GetDatasetPool().getStats().get(url,0)==0
@@ -0,0 +1,149 @@
+import os,threading
+
+import numpy as np
+import pytest
+
+xr=pytest.importorskip("xarray")
+
+from openvisuspy import xarray_backend
+from openvisuspy.xarray_backend import MetadataCatalog,SidecarToMetadata,SidecarFromMetadata,OpenVisusBackendEntrypoint,TimeReadAhead
+
+# ////////////////////////////////////////////////////////////
+def CreateSidecar(idx_url):
+	return xr.Dataset(
+		{"data": (("y","x"), np.zeros((256,256),dtype=np.uint8), {"long_name": "synthetic"})},
+		coords={"y": ("y", np.arange(256,dtype=np.float32), {"units": "m"}), "x": np.arange(256)},
+		attrs={"idx_url": idx_url, "version": np.int32(2)})
+
+# ////////////////////////////////////////////////////////////
+def test_sidecar_metadata_roundtrip(idx_url):
+	ds=CreateSidecar(idx_url)
+	ds1=SidecarFromMetadata(SidecarToMetadata(ds, {}, fields=["data"]))
+	assert ds1.attrs["idx_url"]==idx_url
+	assert ds1["y"].dtype==np.float32 and ds1["y"].attrs["units"]=="m"
+	assert np.array_equal(ds1["x"].values, np.arange(256))
+	assert ds1["data"].dims==("y","x") and ds1["data"].attrs["long_name"]=="synthetic"
+	# big variables which are not idx fields are not catalogued
+	assert SidecarToMetadata(ds, {}, fields=[], max_size=1000) is None
+
+# ////////////////////////////////////////////////////////////
+def test_catalog_validates_local_files(tmp_path):
+	filename=str(tmp_path / "sidecar.nc")
+	with open(filename,"w") as f: f.write("v1")
+	catalog=MetadataCatalog(cache_dir=str(tmp_path / "catalog"))
+	catalog.put(filename, {"value": 1}, kind="sidecar")
+	assert catalog.get(filename, kind="sidecar")=={"value": 1}
+	assert catalog.get(filename) is None
+	with open(filename,"w") as f: f.write("version 2")
+	assert catalog.get(filename, kind="sidecar") is None
+
+# ////////////////////////////////////////////////////////////
+def test_warm_open_does_not_read_the_sidecar(idx_url, tmp_path, monkeypatch):
+	monkeypatch.setenv("VISUS_CACHE", str(tmp_path))
+	filename=str(tmp_path / "sidecar.nc")
+	with open(filename,"w") as f: f.write("netcdf")
+	catalog=MetadataCatalog()
+	catalog.put(filename, SidecarToMetadata(CreateSidecar(idx_url), {}, fields=["data"]), kind="sidecar")
+
+	def OpenDataset(*args, **kwargs):
+		raise Exception("the sidecar should come from the catalog")
+	monkeypatch.setattr(xarray_backend.xr, "open_dataset", OpenDataset)
+
+	backend=OpenVisusBackendEntrypoint()
+	ds=backend.open_dataset(filename)
+	assert ds.attrs["idx_url"]==idx_url
+	assert list(ds["data"].dims)==["time","y","x","resolution"]
+	assert catalog.get(idx_url)["dims"]==[256,256]
+	assert ds["data"].isel(time=0, resolution=16).values.shape==(256,256)
+	ds.close()
+
+# ////////////////////////////////////////////////////////////
+def test_close_only_closes_its_own_arrays(idx_url, tmp_path, monkeypatch):
+	monkeypatch.setenv("VISUS_CACHE", str(tmp_path))
+	arrays=[]
+	class BackendArray(xarray_backend.OpenVisusBackendArray):
+		def __init__(self, *args, **kwargs):
+			super().__init__(*args, **kwargs)
+			self.closed=False
+			arrays.append(self)
+		def close(self):
+			super().close()
+			self.closed=True
+	monkeypatch.setattr(xarray_backend, "OpenVisusBackendArray", BackendArray)
+
+	backend=OpenVisusBackendEntrypoint()
+	datasets=[]
+	for name in ["a.nc","b.nc"]:
+		filename=str(tmp_path / name)
+		with open(filename,"w") as f: f.write(name)
+		MetadataCatalog().put(filename, SidecarToMetadata(CreateSidecar(idx_url), {}, fields=["data"]), kind="sidecar")
+		datasets.append(backend.open_dataset(filename))
+
+	datasets[0].close()
+	assert [it.closed for it in arrays]==[True,False]
+	datasets[1].close()
+	assert [it.closed for it in arrays]==[True,True]
+
+# ////////////////////////////////////////////////////////////
+class FakeFetch:
+	"""
+	records the reads; prefetches (i.e. not on the main thread) wait for `gate`
+	"""
+
+	def __init__(self):
+		self.calls=[]
+		self.gate=threading.Event()
+		self.gate.set()
+
+	def __call__(self, time, res, logic_box, field):
+		self.calls.append(time)
+		if threading.current_thread() is not threading.main_thread():
+			self.gate.wait(timeout=10.0)
+		return (time, res, logic_box, field)
+
+BOX=[[0,0],[256,256]]
+NBYTES=256*256
+
+# ////////////////////////////////////////////////////////////
+def test_readahead_prefetches_num_steps():
+	fetch=FakeFetch()
+	readahead=TimeReadAhead(fetch, num_steps=3)
+	assert readahead.read(0, 16, BOX, "data", NBYTES, 10)[0]==0
+	assert not readahead.pending
+	readahead.read(1, 16, BOX, "data", NBYTES, 10)
+	assert sorted(it[0] for it in readahead.pending)==[2,3,4]
+	# the next one is the prefetched one, and the window moves forward
+	assert readahead.read(2, 16, BOX, "data", NBYTES, 10)[0]==2
+	assert sorted(it[0] for it in readahead.pending)==[3,4,5]
+	readahead.close()
+	assert fetch.calls.count(2)==1
+
+# ////////////////////////////////////////////////////////////
+def test_readahead_is_bounded_by_max_bytes():
+	readahead=TimeReadAhead(FakeFetch(), num_steps=4, max_bytes=2*NBYTES)
+	readahead.read(0, 16, BOX, "data", NBYTES, 10)
+	readahead.read(1, 16, BOX, "data", NBYTES, 10)
+	assert sorted(it[0] for it in readahead.pending)==[2,3]
+	readahead.close()
+
+# ////////////////////////////////////////////////////////////
+@pytest.mark.parametrize("jump", [
+	dict(time=7, logic_box=BOX),
+	dict(time=2, logic_box=[[0,0],[128,128]]),
+])
+def test_readahead_cancels_on_jump(jump):
+	fetch=FakeFetch()
+	fetch.gate.clear()
+	readahead=TimeReadAhead(fetch, num_steps=3, max_workers=1)
+	readahead.read(0, 16, BOX, "data", NBYTES, 10)
+	readahead.read(1, 16, BOX, "data", NBYTES, 10)
+	futures=list(readahead.pending.values())
+	assert len(futures)==3
+
+	readahead.read(jump["time"], 16, jump["logic_box"], "data", NBYTES, 10)
+	assert not readahead.pending
+	# the single worker is stuck on the first prefetch, the queued ones never run
+	assert all(it.cancelled() for it in futures[1:])
+	fetch.gate.set()
+	readahead.close()
+	assert 3 not in fetch.calls and 4 not in fetch.calls